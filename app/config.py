@@ -116,6 +116,62 @@ if not AUTH_REDIRECT_URL:
 logger.info(f"[CONFIG] FRONTEND_URL set to: {FRONTEND_URL}")
 logger.info(f"[CONFIG] AUTH_REDIRECT_URL set to: {AUTH_REDIRECT_URL}")
 
+# CORS configuration
+CORS_ALLOWED_ORIGINS = [
+    origin for origin in (
+        FRONTEND_URL,
+        "https://api.razorpay.com",
+        "https://checkout.razorpay.com"
+    ) if origin
+]
+CORS_ALLOW_HEADERS = [
+    header.strip()
+    for header in os.getenv('CORS_ALLOW_HEADERS', 'Authorization,Content-Type,X-Requested-With,traceparent').split(',')
+    if header.strip()
+]
+# Browsers clamp this (Chrome caps preflight caching at 2 hours)
+CORS_MAX_AGE = int(os.getenv('CORS_MAX_AGE', '7200'))
+
+# Server-to-server routes that skip browser-oriented middleware
+SERVER_TO_SERVER_PATHS = {
+    '/health',
+    '/razorpay-webhook',
+    '/razorpay-webhook/health'
+}
+
+# Outbound call deadlines and retries
+OUTBOUND_DEFAULT_TIMEOUT_SECONDS = float(os.getenv('OUTBOUND_DEFAULT_TIMEOUT_SECONDS', '10'))
+OUTBOUND_MIN_TIMEOUT_SECONDS = float(os.getenv('OUTBOUND_MIN_TIMEOUT_SECONDS', '1'))
+OUTBOUND_MAX_TIMEOUT_SECONDS = float(os.getenv('OUTBOUND_MAX_TIMEOUT_SECONDS', '15'))
+OUTBOUND_TIMEOUT_MULTIPLIER = float(os.getenv('OUTBOUND_TIMEOUT_MULTIPLIER', '3'))
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '2'))
+OUTBOUND_RETRY_BASE_SECONDS = float(os.getenv('OUTBOUND_RETRY_BASE_SECONDS', '0.2'))
+
+# Request tracing (every trace is kept if slow; the sample rate only limits OTLP export)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0.1'))
+TRACE_SLOW_THRESHOLD_MS = float(os.getenv('TRACE_SLOW_THRESHOLD_MS', '500'))
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '100'))
+OTLP_ENDPOINT = os.getenv('OTLP_ENDPOINT')  # e.g. http://localhost:4318
+OTEL_SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'yoga-backend')
+
+# Admin endpoints are disabled unless a token is configured
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN')
+
+# Webhook bodies are a few KB; anything far larger is rejected unread
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv('WEBHOOK_MAX_BODY_BYTES', str(64 * 1024)))
+
+# Notification outbox
+NOTIFICATION_FUNCTION_NAME = os.getenv('NOTIFICATION_FUNCTION_NAME', 'send-notification')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '20'))
+OUTBOX_CONCURRENCY = int(os.getenv('OUTBOX_CONCURRENCY', '5'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv('OUTBOX_POLL_INTERVAL_SECONDS', '5'))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', '10'))
+OUTBOX_LEASE_SECONDS = float(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+
+# Class seat index (a cache; bookings are decided in the database)
+SEAT_INDEX_REFRESH_SECONDS = float(os.getenv('SEAT_INDEX_REFRESH_SECONDS', '60'))
+
 # Currency configuration
 CURRENCY_CONFIGS = {
     'INR': {
@@ -1,36 +1,60 @@
 from fastapi import FastAPI, HTTPException, Request
 from app.services.razorpay_service import create_payment_link
-from fastapi.middleware.cors import CORSMiddleware
+from starlette.middleware import Middleware
 import logging
-from app.config import AUTH_REDIRECT_URL, FRONTEND_URL, IS_DEVELOPMENT, PAYMENT_STATUS_MAP, RAZORPAY_CALLBACK_URL, RESET_PASSWORD_URL, VERIFY_EMAIL_URL
+from app.config import AUTH_REDIRECT_URL, FRONTEND_URL, IS_DEVELOPMENT, PAYMENT_STATUS_MAP, RAZORPAY_CALLBACK_URL, VERIFY_EMAIL_URL
+from app.config import CORS_ALLOWED_ORIGINS, CORS_ALLOW_HEADERS, CORS_MAX_AGE, SERVER_TO_SERVER_PATHS
+from starlette.middleware.cors import CORSMiddleware
+from app.middleware.cors import RouteProfileMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.utils.tracing import tracer
+from app.utils.resilience import call_outbound
 from datetime import datetime
 from app.services.supabase_service import supabase
 from fastapi.responses import JSONResponse
-from typing import Dict, Any
+from typing import Dict, Any, List
 from pydantic import BaseModel, Field
 from typing import Optional
 from pydantic import EmailStr
 import secrets
-import os
-from app.routers import auth, webhook
+from app.routers import admin, auth, classes, webhook
+from app.services.class_booking_service import parse_session_id, seat_index
+from app.services.outbox_service import (
+    dispatcher as outbox_dispatcher, outbox_row,
+    PASSWORD_RESET_EMAIL, CLASS_CONFIRMATION
+)
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    seat_index.start()
+    outbox_dispatcher.start()
+    yield
+    await outbox_dispatcher.stop()
+    await seat_index.stop()
 
-# CORS configuration
-origins = [
-    os.getenv('FRONTEND_URL'),
-    "https://api.razorpay.com",
-    "https://checkout.razorpay.com"
-]
+app = FastAPI(lifespan=lifespan)
 
+# CORS configuration (skipped for webhook and health routes)
 app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["POST", "GET"],
-    allow_headers=["*"],
+    RouteProfileMiddleware,
+    browser_middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=CORS_ALLOWED_ORIGINS,
+            allow_credentials=True,
+            allow_methods=["POST", "GET"],
+            allow_headers=CORS_ALLOW_HEADERS,
+            expose_headers=["x-trace-id"],
+            max_age=CORS_MAX_AGE,
+        )
+    ],
+    server_paths=SERVER_TO_SERVER_PATHS,
 )
 
+# Request tracing (outermost, so it covers every route)
+app.add_middleware(TracingMiddleware, tracer=tracer)
+
 # Logging setup
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -72,14 +96,27 @@ async def create_payment_endpoint(payment_data: dict):
         currency = payment_data.get('currency', 'INR')
         description = payment_data.get('description', 'Yoga Class Payment')
         user_id = payment_data.get('user_id')
+        session_id = payment_data.get('session_id')
+
+        if session_id:
+            session_id = parse_session_id(session_id)
+            # Read through to the database, so cancellations and capacity edits apply
+            seats = await seat_index.refresh(session_id) if session_id else None
+            if seats is None:
+                raise HTTPException(status_code=404, detail="Class session not found")
+            if seats.seats_available <= 0:
+                raise HTTPException(status_code=409, detail="Class is full")
         
         payment_link = await create_payment_link(
             amount=amount, 
             currency=currency, 
             description=description,
-            user_id=user_id
+            user_id=user_id,
+            session_id=session_id
         )
         return {"payment_link": payment_link}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -91,44 +128,28 @@ async def health_check():
         "environment": "production"
     }
 
+async def save_user_records(user: UserCreate, notifications: Optional[List[Dict[str, Any]]] = None) -> None:
+    """Insert the users, profiles and user_interactions rows plus queued notifications in one transaction"""
+    await call_outbound(
+        "supabase.rpc.create_signup_records",
+        lambda: supabase.rpc('create_signup_records', {
+            'user_id': user.userId,
+            'email': user.email,
+            'full_name': user.name,
+            'phone': user.phone,
+            'health_conditions': user.healthConditions,
+            'notifications': notifications or []
+        }).execute(),
+        # Keyed by the auth user id, so a repeated call adds nothing
+        idempotent=bool(user.userId)
+    )
+    if notifications:
+        outbox_dispatcher.wake()
+
 @app.post("/api/create-user")
 async def create_user(user: UserCreate):
     try:
-        # 1. Insert into users table
-        if user.userId:
-            users_result = supabase.table('users').insert({
-                'id': user.userId,
-                'email': user.email,
-                'full_name': user.name,
-                'username': user.email.split('@')[0]
-            }).execute()
-
-            if not users_result.data:
-                logger.warning(f"Failed to create user record for: {user.email}")
-
-            # 2. Insert into profiles table
-            profiles_result = supabase.table('profiles').insert({
-                'id': user.userId,
-                'username': user.email.split('@')[0],  # Using email prefix as username
-                'full_name': user.name
-            }).execute()
-
-            if not profiles_result.data:
-                logger.warning(f"Failed to create profile for: {user.email}")
-
-        # 3. Create user interaction
-        result = supabase.table('user_interactions').insert({
-            'email': user.email,
-            'name': user.name,
-            'phone_number': user.phone,
-            'health_conditions': user.healthConditions or '',
-            'interest': 'Free Weekend Class',
-            'source': 'get_started',
-            'account_created': True
-        }).execute()
-
-        if not result.data:
-            raise HTTPException(status_code=400, detail="Failed to create user interaction")
+        await save_user_records(user)
 
         logger.info(f"User created successfully: {user.email}")
         return {"status": "success", "message": "User created successfully"}
@@ -151,61 +172,75 @@ async def create_auth_user(user_data: dict):
             logger.info(f"Generated temp password for form signup: {user_data['email']}")
             
             # For form signup: Create user with email already confirmed
-            auth_response = supabase.auth.sign_up({
-                "email": user_data["email"],
-                "password": temp_password,
-                "options": {
-                    "data": {
-                        "full_name": user_data["name"],
-                        "phone": user_data.get("phone"),
-                        "healthConditions": user_data.get("healthConditions"),
-                        "source": source
-                    },
-                    "email_confirm": True,  # Auto confirm email
-                    "suppress_email": True   # Don't send confirmation email
-                }
-            })
+            auth_response = await call_outbound(
+                "supabase.auth.sign_up",
+                lambda: supabase.auth.sign_up({
+                    "email": user_data["email"],
+                    "password": temp_password,
+                    "options": {
+                        "data": {
+                            "full_name": user_data["name"],
+                            "phone": user_data.get("phone"),
+                            "healthConditions": user_data.get("healthConditions"),
+                            "source": source
+                        },
+                        "email_confirm": True,  # Auto confirm email
+                        "suppress_email": True   # Don't send confirmation email
+                    }
+                }),
+                source=source
+            )
             
-            # Send only password reset email
-            if auth_response.user:
-                try:
-                    reset_response = supabase.auth.reset_password_for_email(
-                        user_data["email"],
-                        options={
-                            "redirect_to": RESET_PASSWORD_URL
-                        }
-                    )
-                    logger.info(f"Password reset email sent for form signup: {user_data['email']}")
-                except Exception as e:
-                    logger.error(f"Failed to send password reset email: {str(e)}")
-                    pass
-                    
         else:
             # Direct signup: Normal flow with email verification
             temp_password = user_data.get("password")
             if not temp_password:
                 raise HTTPException(status_code=400, detail="Password required for direct signup")
                 
-            auth_response = supabase.auth.sign_up({
-                "email": user_data["email"],
-                "password": temp_password,
-                "options": {
-                    "data": {
-                        "full_name": user_data["name"],
-                        "phone": user_data.get("phone"),
-                        "healthConditions": user_data.get("healthConditions"),
-                        "source": source
-                    },
-                    "email_confirm": False,
-                    "redirect_to": AUTH_REDIRECT_URL
-                }
-            })
+            auth_response = await call_outbound(
+                "supabase.auth.sign_up",
+                lambda: supabase.auth.sign_up({
+                    "email": user_data["email"],
+                    "password": temp_password,
+                    "options": {
+                        "data": {
+                            "full_name": user_data["name"],
+                            "phone": user_data.get("phone"),
+                            "healthConditions": user_data.get("healthConditions"),
+                            "source": source
+                        },
+                        "email_confirm": False,
+                        "redirect_to": AUTH_REDIRECT_URL
+                    }
+                }),
+                source=source
+            )
 
         if not auth_response.user:
             raise HTTPException(status_code=400, detail="Failed to create auth user")
 
+        # Notifications are queued with the user rows; the outbox dispatcher sends them off the request path
+        notifications = []
+        if is_form_signup:
+            # Send only password reset email
+            notifications.append(outbox_row(
+                PASSWORD_RESET_EMAIL,
+                {"email": user_data["email"]},
+                dedupe_key=f"{PASSWORD_RESET_EMAIL}:{auth_response.user.id}"
+            ))
+        if source == 'free_class':
+            notifications.append(outbox_row(
+                CLASS_CONFIRMATION,
+                {
+                    "email": user_data["email"],
+                    "name": user_data["name"],
+                    "class_name": "Free Weekend Class"
+                },
+                dedupe_key=f"{CLASS_CONFIRMATION}:free_class:{auth_response.user.id}"
+            ))
+
         # Create user in database
-        await create_user(UserCreate(
+        await save_user_records(UserCreate(
             userId=auth_response.user.id,
             email=user_data["email"],
             name=user_data["name"],
@@ -213,7 +248,7 @@ async def create_auth_user(user_data: dict):
             healthConditions=user_data.get("healthConditions"),
             interest=user_data.get("interest"),
             source=source
-        ))
+        ), notifications)
 
         return {
             "status": "success",
@@ -226,4 +261,6 @@ async def create_auth_user(user_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
-app.include_router(webhook.router)
\ No newline at end of file
+app.include_router(webhook.router)
+app.include_router(classes.router, prefix="/api/classes", tags=["classes"])
+app.include_router(admin.router, prefix="/admin", tags=["admin"])
\ No newline at end of file
@@ -0,0 +1,34 @@
+"""Per-route middleware profiles"""
+from typing import Iterable, Sequence
+from starlette.middleware import Middleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class RouteProfileMiddleware:
+    """Apply browser-oriented middleware to every route except server-to-server ones
+
+    Requests whose path is in ``server_paths`` (Razorpay webhooks, health
+    checks) go straight to the app; everything else runs through the
+    ``browser_middleware`` stack, which is built once at startup.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        browser_middleware: Sequence[Middleware] = (),
+        server_paths: Iterable[str] = ()
+    ) -> None:
+        self.app = app
+        self.server_paths = frozenset(server_paths)
+
+        browser_app = app
+        for cls, args, kwargs in reversed(browser_middleware):
+            browser_app = cls(browser_app, *args, **kwargs)
+        self.browser_app = browser_app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["path"] in self.server_paths:
+            await self.app(scope, receive, send)
+            return
+
+        await self.browser_app(scope, receive, send)
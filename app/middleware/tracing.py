@@ -0,0 +1,37 @@
+"""Per-request tracing middleware"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.utils.tracing import Tracer
+
+
+class TracingMiddleware:
+    """Open a trace for every HTTP request and return its ID in ``x-trace-id``
+
+    An incoming W3C ``traceparent`` header is continued instead of starting
+    a new trace.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer) -> None:
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        name = f"{scope['method']} {scope['path']}"
+
+        with self.tracer.trace(
+            name,
+            traceparent=headers.get("traceparent"),
+            **{"http.method": scope["method"], "http.target": scope["path"]}
+        ) as trace:
+            async def send_with_trace_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    trace.root.set_attribute("http.status_code", message["status"])
+                    MutableHeaders(scope=message).append("x-trace-id", trace.trace_id)
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Header
+from typing import Optional
+from app.config import ADMIN_API_TOKEN
+from app.utils.tracing import tracer
+from app.utils.resilience import latency_snapshot
+import hmac
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def require_admin_token(token: Optional[str]) -> None:
+    """Reject the request unless it carries the configured admin token"""
+    if not ADMIN_API_TOKEN or not token or not hmac.compare_digest(token, ADMIN_API_TOKEN):
+        logger.warning("Rejected admin request")
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+@router.get("/traces/slow")
+async def get_slow_traces(x_admin_token: Optional[str] = Header(None)):
+    """Most recent traces slower than TRACE_SLOW_THRESHOLD_MS, sampled or not"""
+    require_admin_token(x_admin_token)
+    return {
+        "sample_rate": tracer.sample_rate,
+        "slow_threshold_ms": tracer.slow_threshold_ms,
+        "traces": tracer.slow_traces()
+    }
+
+@router.get("/outbound/latency")
+async def get_outbound_latency(x_admin_token: Optional[str] = Header(None)):
+    """Observed latency percentiles and current deadline per outbound operation"""
+    require_admin_token(x_admin_token)
+    return {"operations": latency_snapshot()}
@@ -3,6 +3,7 @@ from app.models.auth import EmailCheck
 from app.services.supabase_service import supabase
 import logging
 from app.utils.logging_utils import mask_email, get_error_code
+from app.utils.resilience import call_outbound
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -15,10 +16,15 @@ async def check_email_exists(data: EmailCheck):
         logger.debug(f"Processing email check: {masked}")
         
         # Use public users table instead of admin API
-        result = supabase.table('users') \
-            .select('email') \
-            .eq('email', data.email) \
-            .execute()
+        result = await call_outbound(
+            "supabase.users.select_by_email",
+            lambda: supabase.table('users')
+                .select('email')
+                .eq('email', data.email)
+                .execute(),
+            idempotent=True,
+            hedge=True
+        )
             
         exists = len(result.data) > 0
         
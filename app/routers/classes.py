@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException
+from app.services.class_booking_service import parse_session_id, seat_index
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+@router.get("")
+async def list_classes():
+    """Upcoming class sessions with seats left, served from the seat index"""
+    return {"sessions": seat_index.upcoming()}
+
+@router.get("/{session_id}/availability")
+async def get_class_availability(session_id: str):
+    session_id = parse_session_id(session_id)
+    if session_id is None:
+        raise HTTPException(status_code=404, detail="Class session not found")
+
+    try:
+        seats = await seat_index.get(session_id)
+    except Exception as e:
+        logger.error(f"Availability lookup failed: {type(e).__name__}")
+        raise HTTPException(status_code=500, detail="Failed to check class availability")
+
+    if seats is None:
+        raise HTTPException(status_code=404, detail="Class session not found")
+    return seats.to_dict()
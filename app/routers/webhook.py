@@ -1,31 +1,25 @@
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from typing import Dict, Any
 from app.services.payment_service import is_duplicate_event, process_payment_event
-from app.config import RAZORPAY_WEBHOOK_SECRET, PAYMENT_STATUS_MAP
-import hmac
-import hashlib
+from app.config import RAZORPAY_WEBHOOK_SECRET, PAYMENT_STATUS_MAP, WEBHOOK_MAX_BODY_BYTES
+import json
 import logging
 from app.services.supabase_service import supabase
 from fastapi import BackgroundTasks
+from app.utils.resilience import call_outbound
+from app.utils.logging_utils import mask_sensitive_data
+from app.utils.webhook_ingest import PayloadTooLarge, read_signed_body, persisted_entity_fields
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-def verify_webhook_signature(request_body: str, signature: str) -> bool:
-    """Verify Razorpay webhook signature"""
-    expected_signature = hmac.new(
-        RAZORPAY_WEBHOOK_SECRET.encode(),
-        request_body.encode(),
-        hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(expected_signature, signature)
-
-def extract_payment_details(payload: Dict[str, Any]) -> Dict[str, Any]:
+async def extract_payment_details(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Extract relevant payment details from webhook payload"""
     try:
         payment_data = payload.get('payload', {}).get('payment', {}).get('entity', {})
-        notes = payment_data.get('notes', {})
+        # Razorpay sends an empty list when a payment has no notes
+        notes = payment_data.get('notes') or {}
         
         # First try to get user_id from notes
         user_id = notes.get('user_id')
@@ -36,7 +30,12 @@ def extract_payment_details(payload: Dict[str, Any]) -> Dict[str, Any]:
             if user_email:
                 try:
                     # Use public.users table
-                    user_result = supabase.table('users').select('id').eq('email', user_email).execute()
+                    user_result = await call_outbound(
+                        "supabase.users.select_by_email",
+                        lambda: supabase.table('users').select('id').eq('email', user_email).execute(),
+                        idempotent=True,
+                        hedge=True
+                    )
                     user_id = user_result.data[0]['id'] if user_result.data else None
                     logger.info(f"Found user_id: {user_id} for email: {user_email}")
                 except Exception as e:
@@ -52,7 +51,7 @@ def extract_payment_details(payload: Dict[str, Any]) -> Dict[str, Any]:
             'payment_method': payment_data.get('method'),
             'email': payment_data.get('email'),
             'contact': payment_data.get('contact'),
-            'payment_details': payment_data,
+            'payment_details': persisted_entity_fields(payment_data),
             'user_id': user_id
         }
     except Exception as e:
@@ -62,49 +61,58 @@ def extract_payment_details(payload: Dict[str, Any]) -> Dict[str, Any]:
 @router.post("/razorpay-webhook", name="razorpay_webhook")
 async def handle_razorpay_webhook(request: Request):
     try:
-        raw_body = await request.body()
-        body_text = raw_body.decode()
         signature = request.headers.get('x-razorpay-signature')
-        
-        # Missing: Event ID Check for duplicate events
-        event_id = request.headers.get('x-razorpay-event-id')
-        
+        if not signature:
+            logger.error("Missing webhook signature")
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Missing webhook signature"}
+            )
+
+        # 1. Bounded read, verifying the signature before anything is parsed
+        try:
+            body = await read_signed_body(request, RAZORPAY_WEBHOOK_SECRET, signature, WEBHOOK_MAX_BODY_BYTES)
+        except PayloadTooLarge as e:
+            logger.warning(f"Rejected oversized webhook: {str(e)}")
+            return JSONResponse(
+                status_code=413,
+                content={"status": "error", "message": "Payload too large"}
+            )
+        if body is None:
+            logger.error("Invalid webhook signature")
+            return JSONResponse(
+                status_code=400,
+                content={"status": "error", "message": "Invalid signature"}
+            )
+
         # Should return 200 even if event is duplicate
+        event_id = request.headers.get('x-razorpay-event-id')
         if event_id and await is_duplicate_event(event_id):
             return JSONResponse(
                 status_code=200,
                 content={"status": "success", "message": "Event already processed"}
             )
-        
-        logger.info(f"Received webhook with signature: {signature}")
-        
-        if not signature:
-            logger.error("Missing webhook signature")
-            raise HTTPException(status_code=400, detail="Missing webhook signature")
-            
-        # Verify signature
-        if not verify_webhook_signature(body_text, signature):
-            logger.error("Invalid webhook signature")
-            raise HTTPException(status_code=400, detail="Invalid webhook signature")
-            
-        # Parse payload
-        payload = await request.json()
-        logger.info(f"Processing webhook event: {payload.get('event')}")
-        
-        # Extract and process payment details
-        payment_details = extract_payment_details(payload)
-        logger.info(f"Extracted payment details: {payment_details}")
-        
-        # 1. Quick verification
-        if not verify_webhook_signature(body_text, signature):
+
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            logger.error("Webhook body is not valid JSON")
             return JSONResponse(
                 status_code=400,
-                content={"status": "error", "message": "Invalid signature"}
+                content={"status": "error", "message": "Invalid JSON payload"}
             )
-            
+        del body
+        event = payload.get('event')
+        logger.info(f"Processing webhook event: {event}")
+
+        # Keep only the fields we persist; the parsed payload is dropped here
+        payment_details = await extract_payment_details(payload)
+        del payload
+        logger.info(f"Extracted payment details: {mask_sensitive_data(payment_details)}")
+
         # 2. Quick acknowledgment
         background_tasks = BackgroundTasks()
-        background_tasks.add_task(process_payment_event, payload.get('event'), payment_details)
+        background_tasks.add_task(process_payment_event, event, payment_details)
         
         # 3. Immediate response
         return JSONResponse(
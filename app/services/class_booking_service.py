@@ -0,0 +1,305 @@
+from typing import Dict, Any, List, Optional, Set, Tuple
+from app.services.supabase_service import supabase
+import asyncio
+import logging
+import threading
+import uuid
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from dateutil.parser import isoparse
+from app.utils.logging_utils import get_error_code, mask_payment_id
+from app.utils.resilience import call_outbound
+from app.services.outbox_service import dispatcher, outbox_row, CLASS_CONFIRMATION, CLASS_WAITLISTED
+from app.config import SEAT_INDEX_REFRESH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+SESSIONS_TABLE = 'class_sessions'
+ENROLMENTS_TABLE = 'class_enrolments'
+SESSION_FIELDS = 'id, title, starts_at, duration_minutes, capacity'
+
+# Sessions that started up to this long ago are still loaded on rebuild
+REBUILD_LOOKBACK = timedelta(days=1)
+
+def parse_session_id(value: Any) -> Optional[str]:
+    """Canonical form of a class session ID, or None if it is not a UUID
+
+    Session IDs come from clients and payment notes; anything else would
+    make PostgREST fail on the uuid column instead of finding nothing.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        return None
+
+def parse_timestamp(value: str) -> datetime:
+    """Parse a PostgREST timestamp; fromisoformat on Python 3.9 rejects
+    trimmed fractional seconds such as '10:00:00.5+00:00'"""
+    parsed = isoparse(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+class SessionSeats:
+    """Capacity and enrolments of one class session"""
+    __slots__ = ('session_id', 'title', 'starts_at', 'duration_minutes', 'capacity', 'confirmed', 'waitlisted')
+
+    def __init__(self, session: Dict[str, Any]):
+        self.session_id = session['id']
+        self.title = session['title']
+        self.starts_at = parse_timestamp(session['starts_at'])
+        self.duration_minutes = session.get('duration_minutes')
+        self.capacity = session['capacity']
+        self.confirmed: Set[str] = set()
+        self.waitlisted: Set[str] = set()
+
+    @property
+    def seats_available(self) -> int:
+        return max(self.capacity - len(self.confirmed), 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.session_id,
+            'title': self.title,
+            'starts_at': self.starts_at.isoformat(),
+            'duration_minutes': self.duration_minutes,
+            'capacity': self.capacity,
+            'seats_available': self.seats_available
+        }
+
+class SeatIndex:
+    """In-memory seat availability per class session
+
+    A per-process cache that serves availability and listings without a
+    database round trip. It is rebuilt every SEAT_INDEX_REFRESH_SECONDS,
+    so cancellations and capacity edits show up within one interval.
+
+    It does not decide bookings: the book_class_seat database function
+    locks the session row and counts confirmed enrolments, which keeps
+    sessions from being oversold however many workers run. Local
+    reservations only keep this process's view current until the next
+    rebuild.
+    """
+
+    def __init__(self, refresh_interval: float = SEAT_INDEX_REFRESH_SECONDS):
+        self.refresh_interval = refresh_interval
+        self._sessions: Dict[str, SessionSeats] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebuild()
+            except Exception as e:
+                # Sessions are loaded on first use until the next rebuild
+                logger.error(f"Failed to rebuild seat index: {get_error_code(e)}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def rebuild(self) -> None:
+        """Replace the index with upcoming sessions and their enrolments"""
+        since = (datetime.now(timezone.utc) - REBUILD_LOOKBACK).isoformat()
+        sessions = await call_outbound(
+            "supabase.class_sessions.select_upcoming",
+            lambda: supabase.table(SESSIONS_TABLE)
+                .select(SESSION_FIELDS)
+                .eq('status', 'scheduled')
+                .gte('starts_at', since)
+                .execute(),
+            idempotent=True
+        )
+        index = {row['id']: SessionSeats(row) for row in sessions.data}
+
+        if index:
+            enrolments = await self._fetch_enrolments(list(index))
+            for row in enrolments:
+                self._add_enrolment(index[row['session_id']], row)
+
+        with self._lock:
+            self._sessions = index
+        logger.info(f"Seat index rebuilt with {len(index)} sessions")
+
+    async def _fetch_enrolments(self, session_ids: List[str]) -> List[Dict[str, Any]]:
+        result = await call_outbound(
+            "supabase.class_enrolments.select_active",
+            lambda: supabase.table(ENROLMENTS_TABLE)
+                .select('session_id, razorpay_payment_id, status')
+                .in_('session_id', session_ids)
+                .in_('status', ['confirmed', 'waitlisted'])
+                .execute(),
+            idempotent=True
+        )
+        return result.data
+
+    @staticmethod
+    def _add_enrolment(seats: SessionSeats, row: Dict[str, Any]) -> None:
+        if row['status'] == 'confirmed':
+            seats.confirmed.add(row['razorpay_payment_id'])
+        else:
+            seats.waitlisted.add(row['razorpay_payment_id'])
+
+    async def get(self, session_id: str) -> Optional[SessionSeats]:
+        """Seats for a session, loading it from the database if it is not indexed yet"""
+        seats = self._sessions.get(session_id)
+        if seats is not None:
+            return seats
+        return await self.refresh(session_id)
+
+    async def refresh(self, session_id: str) -> Optional[SessionSeats]:
+        """Reload one session from the database, dropping it if it is gone or cancelled"""
+        result = await call_outbound(
+            "supabase.class_sessions.select_by_id",
+            lambda: supabase.table(SESSIONS_TABLE)
+                .select(SESSION_FIELDS)
+                .eq('id', session_id)
+                .eq('status', 'scheduled')
+                .execute(),
+            idempotent=True
+        )
+        if not result.data:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            return None
+
+        loaded = SessionSeats(result.data[0])
+        for row in await self._fetch_enrolments([session_id]):
+            self._add_enrolment(loaded, row)
+
+        with self._lock:
+            self._sessions[session_id] = loaded
+        return loaded
+
+    def upcoming(self) -> List[Dict[str, Any]]:
+        """Indexed sessions that have not started yet, soonest first"""
+        now = datetime.now(timezone.utc)
+        sessions = [seats for seats in list(self._sessions.values()) if seats.starts_at >= now]
+        return [seats.to_dict() for seats in sorted(sessions, key=lambda s: s.starts_at)]
+
+    def reserve(self, seats: SessionSeats, payment_id: str) -> Tuple[str, bool]:
+        """Atomically take a seat for a payment
+
+        Returns the enrolment status ('confirmed' or 'waitlisted') and
+        whether this call created it; a payment that is already enrolled
+        keeps its existing status.
+        """
+        with self._lock:
+            if payment_id in seats.confirmed:
+                return 'confirmed', False
+            if payment_id in seats.waitlisted:
+                return 'waitlisted', False
+            if len(seats.confirmed) < seats.capacity:
+                seats.confirmed.add(payment_id)
+                return 'confirmed', True
+            seats.waitlisted.add(payment_id)
+            return 'waitlisted', True
+
+    def release(self, seats: SessionSeats, payment_id: str) -> None:
+        with self._lock:
+            seats.confirmed.discard(payment_id)
+            seats.waitlisted.discard(payment_id)
+
+    def record(self, session_id: str, payment_id: str, status: str) -> None:
+        """Apply the status the database decided to the indexed session, if any"""
+        with self._lock:
+            seats = self._sessions.get(session_id)
+            if seats is None:
+                return
+            seats.confirmed.discard(payment_id)
+            seats.waitlisted.discard(payment_id)
+            self._add_enrolment(seats, {'razorpay_payment_id': payment_id, 'status': status})
+
+seat_index = SeatIndex()
+
+def booking_notifications(payment_record: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Outbox rows per enrolment status; the database adds the session details"""
+    email = payment_record.get('email')
+    if not email:
+        return {}
+    payment_id = payment_record['razorpay_payment_id']
+    payload = {'email': email, 'razorpay_payment_id': payment_id}
+    return {
+        'confirmed': [outbox_row(CLASS_CONFIRMATION, payload, dedupe_key=f"{CLASS_CONFIRMATION}:{payment_id}")],
+        'waitlisted': [outbox_row(CLASS_WAITLISTED, payload, dedupe_key=f"{CLASS_WAITLISTED}:{payment_id}")]
+    }
+
+class SeatBooking:
+    """A class seat to book together with its captured payment
+
+    The record_payment database function books the seat in the payment's
+    transaction (see book_class_seat in sql/class_booking.sql). Until it
+    answers, the seat is held in the local index; ``settle`` applies the
+    database's decision and ``release`` drops the hold if the write fails.
+    """
+
+    def __init__(self, session_id: str, payment_id: str, notifications: Dict[str, List[Dict[str, Any]]],
+                 seats: Optional[SessionSeats] = None, is_new: bool = False):
+        self.session_id = session_id
+        self.payment_id = payment_id
+        self.notifications = notifications
+        self.seats = seats
+        self.is_new = is_new
+
+    def rpc_argument(self) -> Dict[str, Any]:
+        return {'session_id': self.session_id, 'notifications': self.notifications}
+
+    def release(self) -> None:
+        if self.is_new:
+            seat_index.release(self.seats, self.payment_id)
+
+    def settle(self, booking: Optional[Dict[str, Any]]) -> Optional[str]:
+        """Apply the database's booking result, returning the enrolment status"""
+        if not booking:
+            self.release()
+            logger.warning(f"Payment for unknown class session: {self.session_id}")
+            return None
+
+        status = booking['status']
+        seat_index.record(self.session_id, self.payment_id, status)
+        if booking.get('created'):
+            dispatcher.wake()
+
+        masked_id = mask_payment_id(self.payment_id)
+        if status == 'waitlisted':
+            logger.warning(f"Class full or cancelled, payment waitlisted - Session: {self.session_id}, ID: {masked_id}")
+        else:
+            logger.info(f"Class seat booked - Session: {self.session_id}, ID: {masked_id}")
+        return status
+
+async def prepare_booking(session_id: Any, payment_details: Dict[str, Any]) -> Optional[SeatBooking]:
+    """Hold a seat locally for a captured payment and describe the booking for record_payment
+
+    Returns None when ``session_id`` is not a valid session ID, so the
+    payment is still recorded.
+    """
+    parsed_id = parse_session_id(session_id)
+    payment_id = payment_details['razorpay_payment_id']
+    if parsed_id is None:
+        logger.warning(f"Payment with invalid class session ID - ID: {mask_payment_id(payment_id)}")
+        return None
+
+    # The database decides the booking; a failed lookup only skips the local hold
+    try:
+        seats = await seat_index.get(parsed_id)
+    except Exception as e:
+        logger.error(f"Seat index lookup failed: {get_error_code(e)}")
+        seats = None
+
+    is_new = False
+    if seats is not None:
+        _, is_new = seat_index.reserve(seats, payment_id)
+    return SeatBooking(parsed_id, payment_id, booking_notifications(payment_details), seats, is_new)
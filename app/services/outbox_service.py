@@ -0,0 +1,235 @@
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from app.services.supabase_service import supabase
+import asyncio
+import logging
+import random
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from app.utils.logging_utils import get_error_code
+from app.utils.tracing import tracer, SPAN_KIND_INTERNAL
+from app.utils.resilience import call_outbound
+from app.config import (
+    NOTIFICATION_FUNCTION_NAME, RESET_PASSWORD_URL,
+    OUTBOX_BATCH_SIZE, OUTBOX_CONCURRENCY, OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_POLL_INTERVAL_SECONDS, OUTBOX_RETRY_BASE_SECONDS, OUTBOX_LEASE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_TABLE = 'notification_outbox'
+MAX_RETRY_DELAY_SECONDS = 3600
+
+# Notification kinds
+PASSWORD_RESET_EMAIL = 'password_reset_email'
+PAYMENT_RECEIPT = 'payment_receipt'
+CLASS_CONFIRMATION = 'class_confirmation'
+# Paid for a full or cancelled class; staff refund or move the booking
+CLASS_WAITLISTED = 'class_waitlisted'
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def outbox_row(kind: str, payload: Dict[str, Any], dedupe_key: str) -> Dict[str, Any]:
+    """Build an outbox row for a notification intent; the table defaults make it pending"""
+    return {'kind': kind, 'payload': payload, 'dedupe_key': dedupe_key}
+
+async def send_password_reset_email(payload: Dict[str, Any]) -> None:
+    # Retries are left to the dispatcher's backoff
+    await call_outbound(
+        "supabase.auth.reset_password_for_email",
+        lambda: supabase.auth.reset_password_for_email(
+            payload['email'],
+            {"redirect_to": RESET_PASSWORD_URL}
+        )
+    )
+
+def notification_function_handler(kind: str) -> Handler:
+    """Handler that delivers a notification through the Supabase edge function"""
+    async def handler(payload: Dict[str, Any]) -> None:
+        await call_outbound(
+            f"supabase.functions.{NOTIFICATION_FUNCTION_NAME}",
+            lambda: supabase.functions.invoke(
+                NOTIFICATION_FUNCTION_NAME,
+                {"body": {"type": kind, **payload}}
+            ),
+            notification_kind=kind
+        )
+    return handler
+
+class OutboxDispatcher:
+    """Drains the notification outbox in batches off the request path
+
+    Rows are claimed with a conditional status update, so several workers
+    can drain the same table without sending a notification twice. Failed
+    deliveries are retried with jittered exponential backoff until
+    ``max_attempts`` is reached.
+    """
+
+    def __init__(
+        self,
+        handlers: Dict[str, Handler],
+        batch_size: int = OUTBOX_BATCH_SIZE,
+        concurrency: int = OUTBOX_CONCURRENCY,
+        max_attempts: int = OUTBOX_MAX_ATTEMPTS,
+        poll_interval: float = OUTBOX_POLL_INTERVAL_SECONDS,
+        retry_base: float = OUTBOX_RETRY_BASE_SECONDS,
+        lease: float = OUTBOX_LEASE_SECONDS
+    ):
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_base = retry_base
+        self.lease = lease
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info("Outbox dispatcher started")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        logger.info("Outbox dispatcher stopped")
+
+    def wake(self) -> None:
+        """Drain now instead of waiting for the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_release = loop.time()
+
+        while True:
+            if loop.time() >= next_release:
+                next_release = loop.time() + self.lease
+                try:
+                    await self._release_stale_claims()
+                except Exception as e:
+                    logger.error(f"Failed to release stale outbox claims: {get_error_code(e)}")
+
+            try:
+                drained = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {get_error_code(e)}")
+                drained = 0
+
+            # A full batch means more rows are probably waiting
+            if drained >= self.batch_size:
+                continue
+
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Claim and dispatch one batch, returning the number of rows handled"""
+        rows = await self._claim_batch()
+        if not rows:
+            return 0
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def dispatch(row: Dict[str, Any]) -> None:
+            async with semaphore:
+                await self._dispatch(row)
+
+        with tracer.trace("outbox.dispatch_batch", span_kind=SPAN_KIND_INTERNAL, rows=len(rows)):
+            await asyncio.gather(*(dispatch(row) for row in rows))
+        return len(rows)
+
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        now = _now().isoformat()
+        pending = await call_outbound(
+            "supabase.notification_outbox.select_pending",
+            lambda: supabase.table(OUTBOX_TABLE)
+                .select('id')
+                .eq('status', 'pending')
+                .lte('next_attempt_at', now)
+                .order('next_attempt_at')
+                .limit(self.batch_size)
+                .execute(),
+            idempotent=True
+        )
+
+        ids = [row['id'] for row in pending.data]
+        if not ids:
+            return []
+
+        # Conditional update, so safe to retry: rows already claimed are skipped
+        claimed = await call_outbound(
+            "supabase.notification_outbox.claim",
+            lambda: supabase.table(OUTBOX_TABLE)
+                .update({'status': 'processing', 'locked_at': now})
+                .in_('id', ids)
+                .eq('status', 'pending')
+                .execute(),
+            idempotent=True
+        )
+        return claimed.data
+
+    async def _release_stale_claims(self) -> None:
+        """Return rows left in processing by a crashed worker to the queue"""
+        cutoff = (_now() - timedelta(seconds=self.lease)).isoformat()
+        await call_outbound(
+            "supabase.notification_outbox.release_stale",
+            lambda: supabase.table(OUTBOX_TABLE)
+                .update({'status': 'pending'})
+                .eq('status', 'processing')
+                .lt('locked_at', cutoff)
+                .execute(),
+            idempotent=True
+        )
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.retry_base * (2 ** (attempts - 1)), MAX_RETRY_DELAY_SECONDS)
+        return random.uniform(delay / 2, delay)
+
+    async def _dispatch(self, row: Dict[str, Any]) -> None:
+        attempts = row.get('attempts', 0) + 1
+        try:
+            handler = self.handlers.get(row['kind'])
+            if handler is None:
+                raise ValueError(f"No handler for outbox kind: {row['kind']}")
+            await handler(row['payload'])
+            update = {'status': 'sent', 'attempts': attempts, 'sent_at': _now().isoformat()}
+            logger.info(f"Outbox notification sent - Kind: {row['kind']}, ID: {row['id']}")
+        except Exception as e:
+            error_code = get_error_code(e)
+            update = {'attempts': attempts, 'last_error': f"{type(e).__name__}: {error_code}"}
+            if attempts >= self.max_attempts:
+                update['status'] = 'failed'
+                logger.error(f"Outbox notification failed permanently - Kind: {row['kind']}, ID: {row['id']}")
+            else:
+                update['status'] = 'pending'
+                update['next_attempt_at'] = (_now() + timedelta(seconds=self._retry_delay(attempts))).isoformat()
+                logger.warning(f"Outbox notification failed, will retry - Kind: {row['kind']}, ID: {row['id']}")
+
+        try:
+            await call_outbound(
+                "supabase.notification_outbox.update",
+                lambda: supabase.table(OUTBOX_TABLE).update(update).eq('id', row['id']).execute(),
+                idempotent=True
+            )
+        except Exception as e:
+            # The lease expires and the row is picked up again
+            logger.error(f"Failed to update outbox row {row['id']}: {get_error_code(e)}")
+
+dispatcher = OutboxDispatcher(handlers={
+    PASSWORD_RESET_EMAIL: send_password_reset_email,
+    PAYMENT_RECEIPT: notification_function_handler(PAYMENT_RECEIPT),
+    CLASS_CONFIRMATION: notification_function_handler(CLASS_CONFIRMATION),
+    CLASS_WAITLISTED: notification_function_handler(CLASS_WAITLISTED),
+})
@@ -1,9 +1,12 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from app.services.supabase_service import supabase
 import logging
 from datetime import datetime, timedelta
 from app.utils.logging_utils import mask_sensitive_data, mask_payment_id
 from app.config import PAISE_TO_RUPEE_CONVERSION, CURRENCY_CONFIGS
+from app.services.outbox_service import dispatcher, outbox_row, PAYMENT_RECEIPT
+from app.services.class_booking_service import SeatBooking, prepare_booking
+from app.utils.resilience import call_outbound
 
 logger = logging.getLogger(__name__)
 
@@ -22,8 +25,19 @@ async def process_payment_event(event: str, payment_details: Dict[str, Any]):
         masked_details = mask_sensitive_data(payment_details)
         payment_id = mask_payment_id(payment_details.get('razorpay_payment_id', ''))
 
-        # Update/Insert payment record
-        payment_record = await update_payment_record(payment_details)
+        # A captured payment for a class also books the seat its payment link was created for
+        booking = None
+        if event == 'payment.captured':
+            notes = (payment_details.get('payment_details') or {}).get('notes') or {}
+            if notes.get('session_id'):
+                booking = await prepare_booking(notes['session_id'], payment_details)
+
+        # Update/Insert payment record; the receipt and booking are written in the same transaction
+        payment_record = await update_payment_record(
+            payment_details,
+            send_receipt=event == 'payment.captured',
+            booking=booking
+        )
         
         # Log success based on event type with masked data
         if event == 'payment.captured':
@@ -40,8 +54,28 @@ async def process_payment_event(event: str, payment_details: Dict[str, Any]):
         logger.error(f"Payment processing error: {type(e).__name__}")
         raise
 
-async def update_payment_record(payment_details: Dict[str, Any]) -> Dict[str, Any]:
-    """Update or insert payment record in database"""
+def payment_receipt_row(payment_details: Dict[str, Any]) -> Dict[str, Any]:
+    """Outbox row for the receipt of a captured payment (amount in main currency unit)"""
+    return outbox_row(
+        PAYMENT_RECEIPT,
+        {
+            'email': payment_details['email'],
+            'razorpay_payment_id': payment_details['razorpay_payment_id'],
+            'amount': payment_details.get('amount'),
+            'currency': payment_details.get('currency'),
+            'payment_method': payment_details.get('payment_method')
+        },
+        dedupe_key=f"{PAYMENT_RECEIPT}:{payment_details['razorpay_payment_id']}"
+    )
+
+async def update_payment_record(payment_details: Dict[str, Any], send_receipt: bool = False,
+                                booking: Optional[SeatBooking] = None) -> Dict[str, Any]:
+    """Update or insert payment record in database
+
+    The receipt (``send_receipt``) and the class seat (``booking``) are
+    written in the same transaction, so neither can be lost once the
+    payment is recorded.
+    """
     try:
         # Mask payment details for logging
         masked_details = mask_sensitive_data(payment_details)
@@ -57,20 +91,40 @@ async def update_payment_record(payment_details: Dict[str, Any]) -> Dict[str, An
                 payment_details['amount'] = amount / PAISE_TO_RUPEE_CONVERSION
             elif currency in ['USD', 'EUR']:
                 payment_details['amount'] = amount / 100  # Convert cents to dollars/euros
+
+        notifications = []
+        if send_receipt and payment_details.get('email'):
+            notifications.append(payment_receipt_row(payment_details))
                 
-        result = supabase.table('payments').upsert(
-            payment_details,
-            on_conflict='razorpay_payment_id'
-        ).execute()
+        try:
+            result = await call_outbound(
+                "supabase.rpc.record_payment",
+                lambda: supabase.rpc('record_payment', {
+                    'payment': payment_details,
+                    'notifications': notifications,
+                    'booking': booking.rpc_argument() if booking else None
+                }).execute(),
+                idempotent=True
+            )
+        except Exception:
+            # Nothing was written, so drop the local seat hold
+            if booking:
+                booking.release()
+            raise
         
-        if not result.data:
+        if not result.data or not result.data.get('payment'):
             logger.error("No data returned from payment record update")
             raise Exception("Failed to update payment record")
+
+        if notifications:
+            dispatcher.wake()
+        if booking:
+            booking.settle(result.data.get('booking'))
             
         # Mask the result data before logging
-        masked_result = mask_sensitive_data(result.data[0])
+        masked_result = mask_sensitive_data(result.data['payment'])
         logger.info("Payment record updated successfully")
-        return result.data[0]
+        return result.data['payment']
         
     except Exception as e:
         logger.error(f"Error updating payment record: {str(e)}")
@@ -79,7 +133,11 @@ async def update_payment_record(payment_details: Dict[str, Any]) -> Dict[str, An
 async def is_duplicate_event(event_id: str) -> bool:
     """Check if event has already been processed"""
     try:
-        result = await supabase.table('webhook_events').select('id').eq('event_id', event_id).execute()
+        result = await call_outbound(
+            "supabase.webhook_events.select",
+            lambda: supabase.table('webhook_events').select('id').eq('event_id', event_id).execute(),
+            idempotent=True
+        )
         return bool(result.data)
     except Exception as e:
         logger.error(f"Error checking duplicate event: {str(e)}")
@@ -88,11 +146,14 @@ async def is_duplicate_event(event_id: str) -> bool:
 async def store_webhook_event(event_id: str, event_type: str, payload: dict):
     """Store webhook event for idempotency"""
     try:
-        await supabase.table('webhook_events').insert({
-            'event_id': event_id,
-            'event_type': event_type,
-            'payload': payload,
-            'processed_at': datetime.now().isoformat()
-        }).execute()
+        await call_outbound(
+            "supabase.webhook_events.insert",
+            lambda: supabase.table('webhook_events').insert({
+                'event_id': event_id,
+                'event_type': event_type,
+                'payload': payload,
+                'processed_at': datetime.now().isoformat()
+            }).execute()
+        )
     except Exception as e:
         logger.error(f"Error storing webhook event: {str(e)}")
\ No newline at end of file
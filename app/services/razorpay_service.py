@@ -1,13 +1,14 @@
 import razorpay
-from app.config import RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET, RAZORPAY_CALLBACK_URL
+from app.config import RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET, RAZORPAY_CALLBACK_URL, OUTBOUND_MAX_TIMEOUT_SECONDS
 import logging
+from app.utils.resilience import call_outbound
 
 logger = logging.getLogger(__name__)
 client = razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
 
 SUPPORTED_CURRENCIES = ['INR', 'USD', 'EUR']
 
-async def create_payment_link(amount: int, currency: str = 'INR', description: str = '', user_id: str = None):
+async def create_payment_link(amount: int, currency: str = 'INR', description: str = '', user_id: str = None, session_id: str = None):
     try:
         if currency not in SUPPORTED_CURRENCIES:
             raise ValueError(f"Currency {currency} not supported. Supported currencies: {SUPPORTED_CURRENCIES}")
@@ -20,6 +21,12 @@ async def create_payment_link(amount: int, currency: str = 'INR', description: s
             # No need to multiply by 100 again
             amount = int(amount)
             
+        notes = {}
+        if user_id:
+            notes["user_id"] = user_id
+        if session_id:
+            notes["session_id"] = session_id
+
         payment_data = {
             "amount": amount,
             "currency": currency,
@@ -27,13 +34,16 @@ async def create_payment_link(amount: int, currency: str = 'INR', description: s
             "description": description,
             "callback_url": RAZORPAY_CALLBACK_URL,
             "callback_method": "post",
-            "notes": {
-                "user_id": user_id
-            } if user_id else {}
+            "notes": notes
         }
         
         logger.info(f"Creating payment link with data: {payment_data}")
-        payment_link = client.payment_link.create(payment_data)
+        # Not idempotent: a retry could create a second link
+        payment_link = await call_outbound(
+            "razorpay.payment_link.create",
+            lambda: client.payment_link.create(payment_data, timeout=OUTBOUND_MAX_TIMEOUT_SECONDS),
+            currency=currency
+        )
         return payment_link['short_url']
     except Exception as e:
         logger.error(f"Payment link creation failed: {str(e)}")
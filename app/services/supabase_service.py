@@ -1,7 +1,9 @@
 # backend/app/services/supabase_service.py
 from supabase import create_client, Client
+from supabase.lib.client_options import ClientOptions
 import os
 from dotenv import load_dotenv
+from app.config import OUTBOUND_MAX_TIMEOUT_SECONDS
 
 load_dotenv()
 
@@ -11,4 +13,12 @@ SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
 if not SUPABASE_URL or not SUPABASE_ANON_KEY:
     raise ValueError("Supabase credentials must be set in environment variables")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
\ No newline at end of file
+# Transport timeouts release worker threads that call_outbound has stopped waiting on
+supabase: Client = create_client(
+    SUPABASE_URL,
+    SUPABASE_ANON_KEY,
+    options=ClientOptions(
+        postgrest_client_timeout=OUTBOUND_MAX_TIMEOUT_SECONDS,
+        function_client_timeout=int(OUTBOUND_MAX_TIMEOUT_SECONDS)
+    )
+)
\ No newline at end of file
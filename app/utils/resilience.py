@@ -0,0 +1,172 @@
+"""Deadlines, retries and hedging for outbound Supabase and Razorpay calls"""
+import asyncio
+import httpx
+import logging
+import random
+import requests
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, TypeVar
+from razorpay.errors import GatewayError, ServerError
+from app.utils.tracing import span
+from app.config import (
+    OUTBOUND_DEFAULT_TIMEOUT_SECONDS, OUTBOUND_MIN_TIMEOUT_SECONDS, OUTBOUND_MAX_TIMEOUT_SECONDS,
+    OUTBOUND_TIMEOUT_MULTIPLIER, OUTBOUND_MAX_RETRIES, OUTBOUND_RETRY_BASE_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+# PostgREST codes for a lost or not yet ready database connection
+TRANSIENT_POSTGREST_CODES = {'PGRST000', 'PGRST001', 'PGRST002'}
+
+class OutboundTimeout(Exception):
+    """An outbound call did not finish within its deadline"""
+
+class LatencyTracker:
+    """Sliding window of recent latencies for one operation"""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency at quantile ``q`` (0-1), or None until enough samples exist"""
+        if len(self._samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def deadline(self) -> float:
+        """Timeout derived from the observed p99, clamped to the configured bounds"""
+        p99 = self.percentile(0.99)
+        if p99 is None:
+            return OUTBOUND_DEFAULT_TIMEOUT_SECONDS
+        return min(max(p99 * OUTBOUND_TIMEOUT_MULTIPLIER, OUTBOUND_MIN_TIMEOUT_SECONDS),
+                   OUTBOUND_MAX_TIMEOUT_SECONDS)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {
+            'samples': len(self._samples),
+            'p50_ms': round(p50 * 1000, 1) if p50 is not None else None,
+            'p95_ms': round(p95 * 1000, 1) if p95 is not None else None,
+            'p99_ms': round(p99 * 1000, 1) if p99 is not None else None,
+            'deadline_ms': round(self.deadline() * 1000, 1)
+        }
+
+_latencies: Dict[str, LatencyTracker] = {}
+
+def latency_tracker(operation: str) -> LatencyTracker:
+    tracker = _latencies.get(operation)
+    if tracker is None:
+        tracker = _latencies[operation] = LatencyTracker()
+    return tracker
+
+def latency_snapshot() -> Dict[str, Dict[str, Any]]:
+    """Current latency percentiles and deadlines per operation"""
+    return {operation: tracker.snapshot() for operation, tracker in sorted(_latencies.items())}
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a failed call is worth retrying"""
+    if isinstance(error, (OutboundTimeout, httpx.TransportError, GatewayError, ServerError,
+                          requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+
+    # postgrest APIError keeps the HTTP status or PostgREST code in .code,
+    # gotrue errors keep the HTTP status in .status
+    code = getattr(error, 'code', None)
+    if code in TRANSIENT_POSTGREST_CODES:
+        return True
+    for status in (getattr(error, 'status', None), code):
+        try:
+            if 500 <= int(status) < 600:
+                return True
+        except (TypeError, ValueError):
+            continue
+    return False
+
+async def _attempt(fn: Callable[[], T], tracker: LatencyTracker, deadline: Optional[float] = None) -> T:
+    """Run a blocking call in a worker thread under ``deadline``, or the operation's adaptive one"""
+    loop = asyncio.get_running_loop()
+    if deadline is None:
+        deadline = tracker.deadline()
+    start = loop.time()
+    try:
+        result = await asyncio.wait_for(asyncio.to_thread(fn), timeout=deadline)
+    except asyncio.TimeoutError:
+        # Count the timeout as a slow sample so the deadline adapts upward
+        tracker.record(deadline)
+        raise OutboundTimeout(f"Outbound call timeout after {deadline:.2f}s")
+    tracker.record(loop.time() - start)
+    return result
+
+async def _hedged_attempt(fn: Callable[[], T], tracker: LatencyTracker, current_span) -> T:
+    """Send a second request if the first has not finished by the observed p95"""
+    hedge_after = tracker.percentile(0.95)
+    if hedge_after is None:
+        return await _attempt(fn, tracker)
+
+    primary = asyncio.ensure_future(_attempt(fn, tracker))
+    done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    if current_span is not None:
+        current_span.set_attribute('hedged', True)
+    pending = {primary, asyncio.ensure_future(_attempt(fn, tracker))}
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+        # Cancelling returns promptly; the abandoned worker thread finishes on its own
+        await asyncio.gather(*pending, return_exceptions=True)
+
+async def call_outbound(
+    operation: str,
+    fn: Callable[[], T],
+    *,
+    idempotent: bool = False,
+    hedge: bool = False,
+    **attributes: Any
+) -> T:
+    """Run a blocking outbound call with a deadline, retries and optional hedging
+
+    Idempotent calls (reads, upserts) get a deadline derived from the
+    operation's observed latency, are retried on transient errors with
+    jittered exponential backoff, and with ``hedge=True`` race a second
+    request once the first runs past p95. Other calls get the fixed
+    OUTBOUND_MAX_TIMEOUT_SECONDS deadline: abandoning one early cannot be
+    undone with a retry, and it may still complete on the server.
+    """
+    tracker = latency_tracker(operation)
+    max_attempts = 1 + (OUTBOUND_MAX_RETRIES if idempotent else 0)
+    deadline = None if idempotent else OUTBOUND_MAX_TIMEOUT_SECONDS
+
+    with span(operation, **attributes) as current_span:
+        for attempt in range(1, max_attempts + 1):
+            if current_span is not None:
+                current_span.set_attribute('attempts', attempt)
+            try:
+                if hedge and idempotent:
+                    return await _hedged_attempt(fn, tracker, current_span)
+                return await _attempt(fn, tracker, deadline)
+            except Exception as e:
+                if attempt >= max_attempts or not is_transient_error(e):
+                    raise
+                delay = random.uniform(0, OUTBOUND_RETRY_BASE_SECONDS * (2 ** (attempt - 1)))
+                logger.warning(f"Retrying {operation} after {type(e).__name__} (attempt {attempt})")
+                await asyncio.sleep(delay)
@@ -0,0 +1,261 @@
+"""Lightweight request tracing built on contextvars"""
+import asyncio
+import httpx
+import logging
+import random
+import re
+import secrets
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set
+from app.config import (
+    TRACE_SAMPLE_RATE, TRACE_SLOW_THRESHOLD_MS, TRACE_BUFFER_SIZE,
+    OTLP_ENDPOINT, OTEL_SERVICE_NAME
+)
+
+logger = logging.getLogger(__name__)
+
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+SPAN_KIND_INTERNAL = 1
+
+TRACEPARENT_RE = re.compile(r'^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+_current_trace: ContextVar[Optional['Trace']] = ContextVar('current_trace', default=None)
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+def new_trace_id() -> str:
+    return secrets.token_hex(16)
+
+def new_span_id() -> str:
+    return secrets.token_hex(8)
+
+class Span:
+    """A timed operation within a trace"""
+    __slots__ = ('name', 'span_id', 'parent_id', 'kind', 'attributes', 'error',
+                 'start_ns', '_start_perf', 'duration_ns')
+
+    def __init__(self, name: str, parent_id: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter_ns()
+        self.duration_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def finish(self) -> None:
+        if self.duration_ns is None:
+            self.duration_ns = time.perf_counter_ns() - self._start_perf
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.duration_ns or 0) / 1_000_000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start_ns / 1_000_000_000,
+            'duration_ms': round(self.duration_ms, 3),
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+class Trace:
+    """Spans recorded for one request or background job
+
+    Spans are always collected, so any slow request can be inspected;
+    ``sampled`` only decides whether the trace is exported.
+    """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_span_id: Optional[str] = None,
+                 sampled: bool = True, span_kind: int = SPAN_KIND_SERVER,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id or new_trace_id()
+        self.sampled = sampled
+        self.root = Span(name, parent_id=parent_span_id, kind=span_kind, attributes=attributes)
+        self.spans: List[Span] = []
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'duration_ms': round(self.duration_ms, 3),
+            'spans': [self.root.to_dict()] + [s.to_dict() for s in self.spans]
+        }
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+@contextmanager
+def span(name: str, *, span_kind: int = SPAN_KIND_CLIENT, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span; a no-op outside a trace
+
+    ``span_kind`` is keyword-only and named apart from the attributes, so
+    an attribute called ``kind`` cannot replace the OTLP span kind.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    parent = _current_span.get() or trace.root
+    current = Span(name, parent_id=parent.span_id, kind=span_kind, attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        trace.spans.append(current)
+
+class OTLPExporter:
+    """Send finished traces to an OTLP/HTTP collector as JSON"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 2.0):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self.service_name = service_name
+        self.timeout = timeout
+        self._client = None
+        self._pending: Set[asyncio.Task] = set()
+
+    def submit(self, trace: Trace) -> None:
+        try:
+            task = asyncio.get_running_loop().create_task(self.export(trace))
+        except RuntimeError:
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def export(self, trace: Trace) -> None:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        try:
+            response = await self._client.post(self.url, json=self._encode(trace))
+            response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"Trace export failed: {type(e).__name__}")
+
+    def _encode(self, trace: Trace) -> Dict[str, Any]:
+        def attributes(values: Dict[str, Any]) -> List[Dict[str, Any]]:
+            encoded = []
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    encoded.append({'key': key, 'value': {'boolValue': value}})
+                elif isinstance(value, int):
+                    encoded.append({'key': key, 'value': {'intValue': str(value)}})
+                elif isinstance(value, float):
+                    encoded.append({'key': key, 'value': {'doubleValue': value}})
+                else:
+                    encoded.append({'key': key, 'value': {'stringValue': str(value)}})
+            return encoded
+
+        def encode_span(s: Span) -> Dict[str, Any]:
+            encoded = {
+                'traceId': trace.trace_id,
+                'spanId': s.span_id,
+                'name': s.name,
+                'kind': s.kind,
+                'startTimeUnixNano': str(s.start_ns),
+                'endTimeUnixNano': str(s.start_ns + (s.duration_ns or 0)),
+                'attributes': attributes(s.attributes),
+                'status': {'code': 2, 'message': s.error} if s.error else {'code': 1}
+            }
+            if s.parent_id:
+                encoded['parentSpanId'] = s.parent_id
+            return encoded
+
+        return {
+            'resourceSpans': [{
+                'resource': {'attributes': attributes({'service.name': self.service_name})},
+                'scopeSpans': [{
+                    'scope': {'name': __name__},
+                    'spans': [encode_span(trace.root)] + [encode_span(s) for s in trace.spans]
+                }]
+            }]
+        }
+
+class Tracer:
+    """Starts traces, keeps a ring buffer of slow ones and exports a sample
+
+    Every trace is checked against ``slow_threshold_ms``; ``sample_rate``
+    (or the sampled flag of an incoming traceparent) only limits export.
+    """
+
+    def __init__(self, sample_rate: float = 1.0, slow_threshold_ms: float = 500,
+                 buffer_size: int = 100, exporter: Optional[OTLPExporter] = None):
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.exporter = exporter
+        self._slow: Deque[Dict[str, Any]] = deque(maxlen=buffer_size)
+
+    def _parse_traceparent(self, traceparent: Optional[str]):
+        match = TRACEPARENT_RE.match(traceparent.strip().lower()) if traceparent else None
+        if not match:
+            return None, None, None
+        version, trace_id, parent_span_id, flags = match.groups()
+        # Version ff and all-zero IDs are invalid per W3C Trace Context
+        if version == 'ff' or trace_id == '0' * 32 or parent_span_id == '0' * 16:
+            return None, None, None
+        return trace_id, parent_span_id, bool(int(flags, 16) & 1)
+
+    @contextmanager
+    def trace(self, name: str, traceparent: Optional[str] = None, *, span_kind: int = SPAN_KIND_SERVER,
+              **attributes: Any) -> Iterator[Trace]:
+        """Run a block as the root of a new trace, continuing ``traceparent`` if given"""
+        trace_id, parent_span_id, parent_sampled = self._parse_traceparent(traceparent)
+        if trace_id is not None:
+            # Follow the caller's sampling decision, including flags=00
+            sampled = parent_sampled
+        else:
+            sampled = random.random() < self.sample_rate
+        current = Trace(name, trace_id=trace_id, parent_span_id=parent_span_id,
+                        sampled=sampled, span_kind=span_kind, attributes=attributes)
+
+        trace_token = _current_trace.set(current)
+        span_token = _current_span.set(current.root)
+        try:
+            yield current
+        except BaseException as e:
+            current.root.error = type(e).__name__
+            raise
+        finally:
+            current.root.finish()
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            self._record(current)
+
+    def _record(self, trace: Trace) -> None:
+        if trace.duration_ms >= self.slow_threshold_ms:
+            self._slow.append(trace.to_dict())
+        if trace.sampled and self.exporter is not None:
+            self.exporter.submit(trace)
+
+    def slow_traces(self) -> List[Dict[str, Any]]:
+        """Most recent slow traces first"""
+        return list(reversed(self._slow))
+
+tracer = Tracer(
+    sample_rate=TRACE_SAMPLE_RATE,
+    slow_threshold_ms=TRACE_SLOW_THRESHOLD_MS,
+    buffer_size=TRACE_BUFFER_SIZE,
+    exporter=OTLPExporter(OTLP_ENDPOINT, OTEL_SERVICE_NAME) if OTLP_ENDPOINT else None
+)
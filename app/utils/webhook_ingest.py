@@ -0,0 +1,44 @@
+"""Bounded, signature-first ingestion of webhook request bodies"""
+import hashlib
+import hmac
+from typing import Any, Dict, Optional
+from starlette.requests import Request
+
+# Entity fields kept in payments.payment_details; everything else
+# (card, acquirer_data, upi, ...) is dropped as soon as the body is parsed
+PERSISTED_ENTITY_FIELDS = (
+    'id', 'order_id', 'invoice_id', 'status', 'method', 'amount', 'currency',
+    'amount_refunded', 'refund_status', 'captured', 'description', 'notes',
+    'fee', 'tax', 'international', 'error_code', 'error_description',
+    'error_reason', 'created_at'
+)
+
+class PayloadTooLarge(Exception):
+    """Request body exceeds the configured limit"""
+
+async def read_signed_body(request: Request, secret: str, signature: str, max_bytes: int) -> Optional[bytearray]:
+    """Stream the request body into a bounded buffer, computing its HMAC on the way
+
+    Returns the body when the SHA256 HMAC matches ``signature`` and None
+    when it does not. Raises PayloadTooLarge as soon as the declared or
+    received size passes ``max_bytes``, without reading the rest.
+    """
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+        raise PayloadTooLarge(f"Declared body size {content_length} exceeds {max_bytes} bytes")
+
+    mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+    body = bytearray()
+    async for chunk in request.stream():
+        if len(body) + len(chunk) > max_bytes:
+            raise PayloadTooLarge(f"Body exceeds {max_bytes} bytes")
+        mac.update(chunk)
+        body += chunk
+
+    if not hmac.compare_digest(mac.hexdigest(), signature):
+        return None
+    return body
+
+def persisted_entity_fields(entity: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a Razorpay payment entity restricted to the fields we store"""
+    return {field: entity[field] for field in PERSISTED_ENTITY_FIELDS if field in entity}
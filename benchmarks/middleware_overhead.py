@@ -0,0 +1,128 @@
+"""Per-request overhead of each middleware layer
+
+Drives the ASGI stacks directly (no server, no network) so the numbers
+only reflect middleware work. Run from the repository root:
+
+    python benchmarks/middleware_overhead.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.config refuses to load without credentials; nothing here calls out
+for name in ("SUPABASE_URL", "SUPABASE_ANON_KEY", "RAZORPAY_KEY_ID",
+             "RAZORPAY_KEY_SECRET", "RAZORPAY_WEBHOOK_SECRET"):
+    os.environ.setdefault(name, "benchmark")
+
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from app.middleware.cors import RouteProfileMiddleware
+from app.middleware.tracing import TracingMiddleware
+from app.utils.tracing import Tracer
+
+FRONTEND = "https://yogforever.com"
+ORIGINS = [FRONTEND, "https://api.razorpay.com", "https://checkout.razorpay.com"]
+SERVER_PATHS = {"/health", "/razorpay-webhook", "/razorpay-webhook/health"}
+
+
+async def endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def build_stacks():
+    """Return name -> ASGI app, one entry per layer configuration"""
+    legacy_cors = dict(allow_origins=ORIGINS + [None], allow_credentials=True,
+                       allow_methods=["POST", "GET"], allow_headers=["*"])
+    tuned_cors = dict(allow_origins=ORIGINS, allow_credentials=True, allow_methods=["POST", "GET"],
+                      allow_headers=["Authorization", "Content-Type", "X-Requested-With", "traceparent"],
+                      expose_headers=["x-trace-id"], max_age=7200)
+
+    def routed():
+        return RouteProfileMiddleware(
+            endpoint,
+            browser_middleware=[Middleware(CORSMiddleware, **tuned_cors)],
+            server_paths=SERVER_PATHS
+        )
+
+    # Spans are recorded for every request; without an exporter the
+    # sample rate changes nothing, so one tracer covers both cases
+    tracer = Tracer(sample_rate=1.0, slow_threshold_ms=float("inf"))
+    return {
+        "endpoint only": endpoint,
+        "CORSMiddleware (legacy config)": CORSMiddleware(endpoint, **legacy_cors),
+        "CORSMiddleware (tuned config)": CORSMiddleware(endpoint, **tuned_cors),
+        "RouteProfile + CORS": routed(),
+        "+ Tracing": TracingMiddleware(routed(), tracer=tracer),
+    }
+
+
+def make_scope(method, path, headers):
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "https",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 12345),
+        "server": ("127.0.0.1", 8000),
+    }
+
+
+SCENARIOS = {
+    "webhook POST (no Origin)": make_scope(
+        "POST", "/razorpay-webhook",
+        [("content-type", "application/json"), ("x-razorpay-signature", "0" * 64)]
+    ),
+    "browser POST (Origin)": make_scope(
+        "POST", "/api/create-payment",
+        [("origin", FRONTEND), ("content-type", "application/json")]
+    ),
+    "preflight OPTIONS": make_scope(
+        "OPTIONS", "/api/create-payment",
+        [("origin", FRONTEND), ("access-control-request-method", "POST"),
+         ("access-control-request-headers", "content-type")]
+    ),
+}
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def time_stack(app, scope, iterations):
+    for _ in range(min(1000, iterations)):
+        await app(dict(scope), receive, send)
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+async def main(iterations):
+    stacks = build_stacks()
+    for scenario, scope in SCENARIOS.items():
+        print(f"\n{scenario} ({iterations} requests)")
+        print(f"  {'stack':<34}{'ns/req':>10}{'overhead':>12}")
+        baseline = None
+        for name, app in stacks.items():
+            per_request = await time_stack(app, scope, iterations)
+            if baseline is None:
+                baseline = per_request
+            print(f"  {name:<34}{per_request:>10.0f}{per_request - baseline:>+12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
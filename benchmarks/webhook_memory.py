@@ -0,0 +1,138 @@
+"""Peak memory per webhook request: legacy ingestion vs the bounded path
+
+Replays signed Razorpay-style payloads of increasing size through both
+ingestion paths and reports tracemalloc peaks, including a flood of
+concurrent large requests. Run from the repository root:
+
+    python benchmarks/webhook_memory.py [flood_size]
+"""
+import asyncio
+import gc
+import hashlib
+import hmac
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.requests import Request
+from app.utils.webhook_ingest import PayloadTooLarge, read_signed_body, persisted_entity_fields
+
+SECRET = "benchmark-secret"
+MAX_BODY_BYTES = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+def make_body(padding_bytes):
+    entity = {
+        "id": "pay_benchmark0001", "order_id": "order_benchmark01", "status": "captured",
+        "method": "card", "amount": 150000, "currency": "INR", "email": "user@example.com",
+        "contact": "+910000000000", "notes": {"user_id": "00000000-0000-0000-0000-000000000000"},
+        "card": {"last4": "1111", "network": "Visa"},
+        "acquirer_data": {"auth_code": "x" * padding_bytes},
+    }
+    return json.dumps({"event": "payment.captured", "payload": {"payment": {"entity": entity}}}).encode()
+
+
+def sign(body):
+    return hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+
+def make_request(body, signature, send_content_length=True):
+    headers = [(b"x-razorpay-signature", signature.encode())]
+    if send_content_length:
+        headers.append((b"content-length", str(len(body)).encode()))
+    view = memoryview(body)
+    offset = 0
+
+    async def receive():
+        # Chunks are allocated as they "arrive", and other requests get to
+        # run in between, like concurrent uploads on a real server
+        nonlocal offset
+        await asyncio.sleep(0)
+        chunk = bytes(view[offset:offset + CHUNK_SIZE])
+        offset += len(chunk)
+        return {"type": "http.request", "body": chunk, "more_body": offset < len(body)}
+
+    scope = {"type": "http", "method": "POST", "path": "/razorpay-webhook", "headers": headers, "query_string": b""}
+    return Request(scope, receive)
+
+
+async def legacy_ingest(request):
+    """What handle_razorpay_webhook did before: buffer, decode, verify, parse, keep the entity"""
+    raw_body = await request.body()
+    body_text = raw_body.decode()
+    signature = request.headers["x-razorpay-signature"]
+    expected = hmac.new(SECRET.encode(), body_text.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, signature):
+        return None
+    payload = await request.json()
+    entity = payload["payload"]["payment"]["entity"]
+    return {"razorpay_payment_id": entity["id"], "payment_details": entity}
+
+
+async def bounded_ingest(request):
+    try:
+        body = await read_signed_body(request, SECRET, request.headers["x-razorpay-signature"], MAX_BODY_BYTES)
+    except PayloadTooLarge:
+        return None
+    if body is None:
+        return None
+    payload = json.loads(body)
+    del body
+    entity = payload["payload"]["payment"]["entity"]
+    details = {"razorpay_payment_id": entity["id"], "payment_details": persisted_entity_fields(entity)}
+    del payload, entity
+    return details
+
+
+async def measure(ingest, body, signature, content_length, count):
+    """Peak traced bytes while handling ``count`` concurrent requests, and bytes
+    still held afterwards by what would be handed to the background task"""
+    # Let the loop drop its handles to the previous run before the baseline
+    await asyncio.sleep(0)
+    gc.collect()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    requests = [make_request(body, signature, content_length) for _ in range(count)]
+    results = await asyncio.gather(*(ingest(r) for r in requests))
+    del requests
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    del results
+    return peak - baseline, current - baseline
+
+
+SCENARIOS = [
+    # name, padding bytes, valid signature, send Content-Length
+    ("typical 4 KB payload", 3 * 1024, True, True),
+    ("1 MB payload, valid signature", 1024 * 1024, True, True),
+    ("1 MB payload, bad signature", 1024 * 1024, False, True),
+    ("1 MB payload, chunked (no Content-Length)", 1024 * 1024, True, False),
+]
+
+
+def kib(n):
+    return f"{n / 1024:,.1f}"
+
+
+async def main(flood_size):
+    tracemalloc.start()
+    print(f"{'scenario':<44}{'requests':>9}{'legacy peak KiB':>18}{'bounded peak KiB':>18}"
+          f"{'legacy held KiB':>17}{'bounded held KiB':>18}")
+    for name, padding, valid, content_length in SCENARIOS:
+        body = make_body(padding)
+        signature = sign(body) if valid else "0" * 64
+        for count in (1, flood_size):
+            rows = [await measure(ingest, body, signature, content_length, count)
+                    for ingest in (legacy_ingest, bounded_ingest)]
+            (legacy_peak, legacy_held), (bounded_peak, bounded_held) = rows
+            print(f"{name:<44}{count:>9}{kib(legacy_peak):>18}{kib(bounded_peak):>18}"
+                  f"{kib(legacy_held):>17}{kib(bounded_held):>18}")
+    tracemalloc.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50))
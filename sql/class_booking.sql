@@ -0,0 +1,111 @@
+-- Class sessions and enrolments used by app/services/class_booking_service.py
+create table if not exists public.class_sessions (
+    id uuid primary key default gen_random_uuid(),
+    title text not null,
+    starts_at timestamptz not null,
+    duration_minutes integer not null default 60,
+    capacity integer not null check (capacity >= 0),
+    status text not null default 'scheduled'
+        check (status in ('scheduled', 'cancelled')),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists class_sessions_upcoming_idx
+    on public.class_sessions (starts_at)
+    where status = 'scheduled';
+
+create table if not exists public.class_enrolments (
+    id bigint generated always as identity primary key,
+    session_id uuid not null references public.class_sessions (id),
+    user_id uuid,
+    email text,
+    razorpay_payment_id text not null unique,
+    -- waitlisted: paid after the class filled up, needs a refund or a move
+    status text not null default 'confirmed'
+        check (status in ('confirmed', 'waitlisted', 'cancelled')),
+    created_at timestamptz not null default now()
+);
+
+create index if not exists class_enrolments_session_idx
+    on public.class_enrolments (session_id, status);
+
+-- Enrol a captured payment in a session. record_payment (in
+-- notification_outbox.sql) calls it inside the payment's transaction.
+-- The session row is locked, so concurrent bookings from any number of
+-- workers are counted one at a time and a session is never oversold.
+-- Payments for a full or cancelled session are waitlisted. Safe to
+-- retry: a payment that is already enrolled keeps its status.
+--
+-- notifications: {"confirmed": [...], "waitlisted": [...]} outbox rows
+-- (see enqueue_notifications); the ones for the resulting status are
+-- queued with the session's title and start time added to their payload.
+-- Returns null when the session does not exist.
+create or replace function public.book_class_seat(
+    session_id uuid,
+    razorpay_payment_id text,
+    user_id uuid default null,
+    email text default null,
+    notifications jsonb default '{}'::jsonb
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    booked_session public.class_sessions;
+    existing_status text;
+    confirmed_count integer;
+    enrolment_status text;
+begin
+    select * into booked_session
+    from public.class_sessions s
+    where s.id = book_class_seat.session_id
+    for update;
+
+    if not found then
+        return null;
+    end if;
+
+    select e.status into existing_status
+    from public.class_enrolments e
+    where e.razorpay_payment_id = book_class_seat.razorpay_payment_id;
+
+    if found then
+        return jsonb_build_object(
+            'status', existing_status,
+            'created', false,
+            'session', to_jsonb(booked_session)
+        );
+    end if;
+
+    select count(*) into confirmed_count
+    from public.class_enrolments e
+    where e.session_id = booked_session.id and e.status = 'confirmed';
+
+    enrolment_status := case
+        when booked_session.status = 'scheduled' and confirmed_count < booked_session.capacity
+            then 'confirmed'
+        else 'waitlisted'
+    end;
+
+    insert into public.class_enrolments (session_id, user_id, email, razorpay_payment_id, status)
+    values (booked_session.id, book_class_seat.user_id, book_class_seat.email,
+            book_class_seat.razorpay_payment_id, enrolment_status);
+
+    perform public.enqueue_notifications((
+        select coalesce(jsonb_agg(
+            n.item || jsonb_build_object('payload', coalesce(n.item -> 'payload', '{}'::jsonb) || jsonb_build_object(
+                'session_id', booked_session.id,
+                'class_name', booked_session.title,
+                'starts_at', booked_session.starts_at
+            ))
+        ), '[]'::jsonb)
+        from jsonb_array_elements(coalesce(notifications -> enrolment_status, '[]'::jsonb)) as n(item)
+    ));
+
+    return jsonb_build_object(
+        'status', enrolment_status,
+        'created', true,
+        'session', to_jsonb(booked_session)
+    );
+end;
+$$;
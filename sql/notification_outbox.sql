@@ -0,0 +1,132 @@
+-- Notification outbox drained by app/services/outbox_service.py
+create table if not exists public.notification_outbox (
+    id bigint generated always as identity primary key,
+    kind text not null,
+    payload jsonb not null default '{}'::jsonb,
+    dedupe_key text unique,
+    status text not null default 'pending'
+        check (status in ('pending', 'processing', 'sent', 'failed')),
+    attempts integer not null default 0,
+    last_error text,
+    next_attempt_at timestamptz not null default now(),
+    locked_at timestamptz,
+    sent_at timestamptz,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists notification_outbox_pending_idx
+    on public.notification_outbox (next_attempt_at)
+    where status = 'pending';
+
+-- Business writes that record their notification intents in the same
+-- transaction, so a row is never saved without its outbox entries (or
+-- the other way round). Called through supabase.rpc().
+
+-- notifications: [{"kind": ..., "payload": {...}, "dedupe_key": ...}]
+create or replace function public.enqueue_notifications(notifications jsonb)
+returns void
+language sql
+as $$
+    insert into public.notification_outbox (kind, payload, dedupe_key)
+    select n.kind, coalesce(n.payload, '{}'::jsonb), n.dedupe_key
+    from jsonb_to_recordset(coalesce(notifications, '[]'::jsonb))
+        as n(kind text, payload jsonb, dedupe_key text)
+    on conflict (dedupe_key) do nothing;
+$$;
+
+-- Rows for a new signup. Safe to retry: users and profiles are keyed by
+-- the auth user id, and the interaction is only recorded with a new user.
+create or replace function public.create_signup_records(
+    user_id uuid,
+    email text,
+    full_name text,
+    phone text default null,
+    health_conditions text default null,
+    notifications jsonb default '[]'::jsonb
+)
+returns void
+language plpgsql
+as $$
+declare
+    new_user boolean := true;
+begin
+    if user_id is not null then
+        insert into public.users (id, email, full_name, username)
+        values (user_id, email, full_name, split_part(email, '@', 1))
+        on conflict (id) do nothing;
+        new_user := found;
+
+        insert into public.profiles (id, username, full_name)
+        values (user_id, split_part(email, '@', 1), full_name)
+        on conflict (id) do nothing;
+    end if;
+
+    if new_user then
+        insert into public.user_interactions
+            (email, name, phone_number, health_conditions, interest, source, account_created)
+        values
+            (email, full_name, phone, coalesce(health_conditions, ''), 'Free Weekend Class', 'get_started', true);
+    end if;
+
+    perform public.enqueue_notifications(notifications);
+end;
+$$;
+
+-- Upsert a payment from a webhook event. When booking is given
+-- ({"session_id": ..., "notifications": {...}}, see book_class_seat in
+-- class_booking.sql), the class seat is booked in the same transaction,
+-- so a recorded payment always has its enrolment or waitlist entry.
+-- Returns {"payment": <stored row>, "booking": <book_class_seat result>}.
+drop function if exists public.record_payment(jsonb, jsonb);
+
+create or replace function public.record_payment(
+    payment jsonb,
+    notifications jsonb default '[]'::jsonb,
+    booking jsonb default null
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    stored public.payments;
+    booked jsonb;
+begin
+    insert into public.payments as p (
+        razorpay_payment_id, razorpay_order_id, amount, currency, status,
+        payment_method, email, contact, payment_details, user_id
+    )
+    select
+        r.razorpay_payment_id, r.razorpay_order_id, r.amount, r.currency, r.status,
+        r.payment_method, r.email, r.contact, r.payment_details, r.user_id
+    from jsonb_to_record(payment) as r(
+        razorpay_payment_id text, razorpay_order_id text, amount numeric, currency text,
+        status text, payment_method text, email text, contact text,
+        payment_details jsonb, user_id uuid
+    )
+    on conflict (razorpay_payment_id) do update set
+        razorpay_order_id = excluded.razorpay_order_id,
+        amount = excluded.amount,
+        currency = excluded.currency,
+        status = excluded.status,
+        payment_method = excluded.payment_method,
+        email = excluded.email,
+        contact = excluded.contact,
+        payment_details = excluded.payment_details,
+        user_id = excluded.user_id
+    returning * into stored;
+
+    perform public.enqueue_notifications(notifications);
+
+    if booking is not null then
+        booked := public.book_class_seat(
+            (booking ->> 'session_id')::uuid,
+            stored.razorpay_payment_id,
+            stored.user_id::uuid,
+            stored.email,
+            coalesce(booking -> 'notifications', '{}'::jsonb)
+        );
+    end if;
+
+    return jsonb_build_object('payment', to_jsonb(stored), 'booking', booked);
+end;
+$$;
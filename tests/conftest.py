@@ -0,0 +1,11 @@
+import os
+
+# app.config refuses to load without credentials; tests never call out
+for name, value in {
+    'SUPABASE_URL': 'https://test.supabase.co',
+    'SUPABASE_ANON_KEY': 'test.anon.key',
+    'RAZORPAY_KEY_ID': 'rzp_test_key',
+    'RAZORPAY_KEY_SECRET': 'test-secret',
+    'RAZORPAY_WEBHOOK_SECRET': 'test-webhook-secret',
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,225 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.services import class_booking_service, payment_service
+from app.services.class_booking_service import SeatIndex, SessionSeats
+from app.services.payment_service import process_payment_event
+
+SESSION_ID = '7d3b2a48-5f1e-4c8e-9a61-2f4b8c0d9e17'
+
+def session_row(capacity=2, starts_at='2030-01-01T10:00:00+00:00', session_id=SESSION_ID):
+    return {'id': session_id, 'title': 'Morning Flow', 'starts_at': starts_at,
+            'duration_minutes': 60, 'capacity': capacity}
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+class FakeDatabase:
+    """Stands in for the record_payment RPC and the book_class_seat call
+    inside it; each call runs to completion on the event loop, like a
+    transaction holding the session row lock"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.payments = {}
+        self.enrolments = {}
+        self.outbox = {}
+        self.calls = []
+
+    def enqueue(self, rows):
+        for row in rows:
+            self.outbox.setdefault(row['dedupe_key'], row)
+
+    def book(self, payment_id, booking):
+        created = payment_id not in self.enrolments
+        if created:
+            confirmed = sum(1 for status in self.enrolments.values() if status == 'confirmed')
+            status = 'confirmed' if confirmed < self.capacity else 'waitlisted'
+            self.enrolments[payment_id] = status
+            self.enqueue(booking['notifications'].get(status, []))
+        return {'status': self.enrolments[payment_id], 'created': created,
+                'session': session_row(self.capacity)}
+
+    def rpc(self, name, params):
+        assert name == 'record_payment'
+        database = self
+
+        class Call:
+            def execute(self):
+                database.calls.append(params)
+                payment = dict(params['payment'])
+                database.payments[payment['razorpay_payment_id']] = payment
+                database.enqueue(params['notifications'])
+                booked = None
+                if params['booking'] is not None:
+                    booked = database.book(payment['razorpay_payment_id'], params['booking'])
+                return Result({'payment': payment, 'booking': booked})
+        return Call()
+
+@pytest.fixture
+def index(monkeypatch):
+    index = SeatIndex()
+    monkeypatch.setattr(class_booking_service, 'seat_index', index)
+    return index
+
+@pytest.fixture
+def database(monkeypatch, index):
+    database = FakeDatabase(capacity=2)
+    index._sessions[SESSION_ID] = SessionSeats(session_row(database.capacity))
+
+    async def call_outbound(operation, fn, **kwargs):
+        # Yield first, so concurrent payments interleave
+        await asyncio.sleep(0)
+        return fn()
+
+    monkeypatch.setattr(payment_service, 'supabase', database)
+    monkeypatch.setattr(payment_service, 'call_outbound', call_outbound)
+    return database
+
+def captured_payment(n, session_id=SESSION_ID):
+    return {
+        'razorpay_payment_id': f'pay_{n}',
+        'amount': 50000,
+        'currency': 'INR',
+        'status': 'captured',
+        'email': f'member{n}@example.com',
+        'user_id': None,
+        'payment_details': {'notes': {'session_id': session_id}}
+    }
+
+def outbox_kinds(database):
+    return sorted(row['kind'] for row in database.outbox.values())
+
+def test_reserve_confirms_until_full_then_waitlists():
+    index = SeatIndex()
+    seats = SessionSeats(session_row(capacity=2))
+    assert index.reserve(seats, 'pay_1') == ('confirmed', True)
+    assert index.reserve(seats, 'pay_2') == ('confirmed', True)
+    assert index.reserve(seats, 'pay_3') == ('waitlisted', True)
+    assert seats.seats_available == 0
+
+def test_reserve_is_idempotent_per_payment():
+    index = SeatIndex()
+    seats = SessionSeats(session_row(capacity=1))
+    index.reserve(seats, 'pay_1')
+    assert index.reserve(seats, 'pay_1') == ('confirmed', False)
+    assert len(seats.confirmed) == 1
+
+def test_release_frees_the_seat():
+    index = SeatIndex()
+    seats = SessionSeats(session_row(capacity=1))
+    index.reserve(seats, 'pay_1')
+    index.release(seats, 'pay_1')
+    assert seats.seats_available == 1
+    assert index.reserve(seats, 'pay_2') == ('confirmed', True)
+
+def test_concurrent_reservations_do_not_oversell():
+    index = SeatIndex()
+    seats = SessionSeats(session_row(capacity=5))
+    barrier = threading.Barrier(20)
+
+    def reserve(n):
+        barrier.wait()
+        index.reserve(seats, f'pay_{n}')
+
+    threads = [threading.Thread(target=reserve, args=(n,)) for n in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(seats.confirmed) == 5
+    assert len(seats.waitlisted) == 15
+
+def test_starts_at_with_trimmed_fractional_seconds_is_parsed():
+    seats = SessionSeats(session_row(starts_at='2030-01-01T10:00:00.5+00:00'))
+    assert seats.starts_at == datetime(2030, 1, 1, 10, 0, 0, 500000, tzinfo=timezone.utc)
+    assert SessionSeats(session_row(starts_at='2030-01-01T10:00:00Z')).starts_at.tzinfo is not None
+
+def test_upcoming_skips_past_sessions_and_sorts_by_start():
+    index = SeatIndex()
+    now = datetime.now(timezone.utc)
+    for session_id, offset in (('later', 2), ('past', -1), ('sooner', 1)):
+        starts_at = (now + timedelta(days=offset)).isoformat()
+        index._sessions[session_id] = SessionSeats(session_row(starts_at=starts_at, session_id=session_id))
+    assert [s['id'] for s in index.upcoming()] == ['sooner', 'later']
+
+@pytest.mark.asyncio
+async def test_concurrent_payments_do_not_oversell(index, database):
+    await asyncio.gather(*(process_payment_event('payment.captured', captured_payment(n)) for n in range(10)))
+
+    statuses = list(database.enrolments.values())
+    assert statuses.count('confirmed') == 2
+    assert statuses.count('waitlisted') == 8
+    seats = index._sessions[SESSION_ID]
+    assert len(seats.confirmed) == 2
+    assert len(seats.waitlisted) == 8
+    assert outbox_kinds(database) == sorted(
+        ['payment_receipt'] * 10 + ['class_confirmation'] * 2 + ['class_waitlisted'] * 8
+    )
+
+@pytest.mark.asyncio
+async def test_payment_receipt_and_booking_are_one_write(index, database):
+    await process_payment_event('payment.captured', captured_payment(1))
+
+    assert len(database.calls) == 1
+    call = database.calls[0]
+    assert [row['kind'] for row in call['notifications']] == ['payment_receipt']
+    assert call['booking']['session_id'] == SESSION_ID
+    assert database.enrolments == {'pay_1': 'confirmed'}
+
+@pytest.mark.asyncio
+async def test_replayed_payment_keeps_status(index, database):
+    await process_payment_event('payment.captured', captured_payment(1))
+    await process_payment_event('payment.captured', captured_payment(1))
+
+    assert database.enrolments == {'pay_1': 'confirmed'}
+    assert outbox_kinds(database) == ['class_confirmation', 'payment_receipt']
+    assert index._sessions[SESSION_ID].confirmed == {'pay_1'}
+
+@pytest.mark.asyncio
+async def test_database_decision_overrides_local_hold(index, database):
+    # Another worker filled the session; this process has not seen it yet
+    database.enrolments.update({'pay_other_1': 'confirmed', 'pay_other_2': 'confirmed'})
+
+    await process_payment_event('payment.captured', captured_payment(1))
+
+    assert database.enrolments['pay_1'] == 'waitlisted'
+    seats = index._sessions[SESSION_ID]
+    assert 'pay_1' in seats.waitlisted
+    assert 'pay_1' not in seats.confirmed
+    assert 'class_waitlisted' in outbox_kinds(database)
+
+@pytest.mark.asyncio
+async def test_failed_write_releases_the_seat(monkeypatch, index, database):
+    async def failing_call_outbound(operation, fn, **kwargs):
+        raise ConnectionError('database unavailable')
+
+    monkeypatch.setattr(payment_service, 'call_outbound', failing_call_outbound)
+
+    with pytest.raises(ConnectionError):
+        await process_payment_event('payment.captured', captured_payment(1))
+
+    seats = index._sessions[SESSION_ID]
+    assert seats.seats_available == 2
+    assert 'pay_1' not in seats.waitlisted
+    assert database.payments == {}
+
+@pytest.mark.asyncio
+async def test_invalid_session_id_still_records_payment(index, database):
+    await process_payment_event('payment.captured', captured_payment(1, session_id='not-a-uuid'))
+
+    assert 'pay_1' in database.payments
+    assert database.calls[0]['booking'] is None
+    assert database.enrolments == {}
+    assert outbox_kinds(database) == ['payment_receipt']
+
+@pytest.mark.asyncio
+async def test_failed_payment_books_nothing(index, database):
+    await process_payment_event('payment.failed', captured_payment(1))
+
+    assert database.calls[0]['booking'] is None
+    assert database.calls[0]['notifications'] == []
+    assert index._sessions[SESSION_ID].seats_available == 2
@@ -0,0 +1,26 @@
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.class_booking_service import parse_session_id
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_parse_session_id():
+    session_id = uuid.uuid4()
+    assert parse_session_id(str(session_id)) == str(session_id)
+    assert parse_session_id(str(session_id).upper()) == str(session_id)
+    assert parse_session_id('1; drop table class_sessions') is None
+    assert parse_session_id('') is None
+    assert parse_session_id(42) is None
+
+def test_availability_of_non_uuid_session_is_not_found(client):
+    response = client.get('/api/classes/not-a-uuid/availability')
+    assert response.status_code == 404
+
+def test_payment_link_for_non_uuid_session_is_not_found(client):
+    response = client.post('/api/create-payment', json={'amount': 500, 'session_id': 'not-a-uuid'})
+    assert response.status_code == 404
+    assert response.json()['detail'] == 'Class session not found'
@@ -0,0 +1,32 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.config import FRONTEND_URL
+from app.main import app
+
+@pytest.fixture
+def client():
+    # Not used as a context manager, so the lifespan tasks are not started
+    return TestClient(app)
+
+def test_webhook_skips_cors(client):
+    response = client.post('/razorpay-webhook', content=b'{}', headers={'origin': FRONTEND_URL})
+    assert 'access-control-allow-origin' not in response.headers
+
+def test_browser_route_gets_cors_headers(client):
+    response = client.get('/api/classes', headers={'origin': FRONTEND_URL})
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-origin'] == FRONTEND_URL
+    assert 'x-trace-id' in response.headers['access-control-expose-headers']
+
+def test_preflight_allows_traceparent(client):
+    response = client.options('/api/create-payment', headers={
+        'origin': FRONTEND_URL,
+        'access-control-request-method': 'POST',
+        'access-control-request-headers': 'content-type, traceparent'
+    })
+    assert response.status_code == 200
+    assert response.headers['access-control-allow-origin'] == FRONTEND_URL
+
+def test_unknown_origin_is_not_allowed(client):
+    response = client.get('/api/classes', headers={'origin': 'https://evil.example'})
+    assert 'access-control-allow-origin' not in response.headers
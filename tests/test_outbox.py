@@ -0,0 +1,190 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from app.services import outbox_service
+from app.services.outbox_service import OutboxDispatcher
+
+class Result:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    """The slice of the postgrest query builder the dispatcher uses"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.filters = []
+        self.values = None
+        self.order_by = None
+        self.max_rows = None
+
+    def select(self, columns):
+        return self
+
+    def update(self, values):
+        self.values = values
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def lte(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] <= value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] < value)
+        return self
+
+    def in_(self, column, values):
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column):
+        self.order_by = column
+        return self
+
+    def limit(self, count):
+        self.max_rows = count
+        return self
+
+    def execute(self):
+        matched = [row for row in self.rows if all(f(row) for f in self.filters)]
+        if self.order_by:
+            matched.sort(key=lambda row: row[self.order_by])
+        if self.max_rows is not None:
+            matched = matched[:self.max_rows]
+        if self.values is not None:
+            for row in matched:
+                row.update(self.values)
+        return Result([dict(row) for row in matched])
+
+class FakeClient:
+    def __init__(self):
+        self.rows = []
+
+    def table(self, name):
+        assert name == outbox_service.OUTBOX_TABLE
+        return FakeQuery(self.rows)
+
+def iso(delta_seconds=0):
+    return (datetime.now(timezone.utc) + timedelta(seconds=delta_seconds)).isoformat()
+
+def outbox_row(row_id, kind='payment_receipt', status='pending', attempts=0, due_in=-1, locked_at=None):
+    return {'id': row_id, 'kind': kind, 'payload': {'email': f'member{row_id}@example.com'},
+            'status': status, 'attempts': attempts, 'next_attempt_at': iso(due_in),
+            'locked_at': locked_at, 'last_error': None, 'sent_at': None}
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeClient()
+
+    async def call_outbound(operation, fn, **kwargs):
+        # Yield first, so concurrent drains interleave between requests
+        await asyncio.sleep(0)
+        return fn()
+
+    monkeypatch.setattr(outbox_service, 'supabase', client)
+    monkeypatch.setattr(outbox_service, 'call_outbound', call_outbound)
+    return client
+
+class RecordingHandler:
+    def __init__(self, error=None):
+        self.error = error
+        self.payloads = []
+
+    async def __call__(self, payload):
+        self.payloads.append(payload)
+        if self.error:
+            raise self.error
+
+def dispatcher(handler, **kwargs):
+    return OutboxDispatcher(handlers={'payment_receipt': handler}, retry_base=10, **kwargs)
+
+def row_by_id(client, row_id):
+    return next(row for row in client.rows if row['id'] == row_id)
+
+@pytest.mark.asyncio
+async def test_due_rows_are_sent_once(client):
+    client.rows.extend([outbox_row(1), outbox_row(2), outbox_row(3, due_in=600)])
+    handler = RecordingHandler()
+
+    assert await dispatcher(handler).drain_once() == 2
+    assert len(handler.payloads) == 2
+    for row_id in (1, 2):
+        row = row_by_id(client, row_id)
+        assert row['status'] == 'sent'
+        assert row['attempts'] == 1
+        assert row['sent_at'] is not None
+    assert row_by_id(client, 3)['status'] == 'pending'
+
+    # Nothing left that is due
+    assert await dispatcher(handler).drain_once() == 0
+    assert len(handler.payloads) == 2
+
+@pytest.mark.asyncio
+async def test_claim_respects_batch_size(client):
+    client.rows.extend(outbox_row(row_id) for row_id in range(5))
+    assert await dispatcher(RecordingHandler(), batch_size=3).drain_once() == 3
+    assert sum(row['status'] == 'sent' for row in client.rows) == 3
+
+@pytest.mark.asyncio
+async def test_concurrent_drains_send_each_row_once(client):
+    client.rows.extend(outbox_row(row_id) for row_id in range(4))
+    handler = RecordingHandler()
+
+    drained = await asyncio.gather(dispatcher(handler).drain_once(), dispatcher(handler).drain_once())
+
+    assert sum(drained) == 4
+    assert len(handler.payloads) == 4
+
+@pytest.mark.asyncio
+async def test_failed_send_is_rescheduled_with_backoff(client):
+    client.rows.append(outbox_row(1, attempts=2))
+    before = datetime.now(timezone.utc)
+
+    await dispatcher(RecordingHandler(ConnectionError('edge function down'))).drain_once()
+
+    row = row_by_id(client, 1)
+    assert row['status'] == 'pending'
+    assert row['attempts'] == 3
+    assert row['last_error'].startswith('ConnectionError')
+    # Third attempt: base 10s * 2**2, jittered down to no less than half
+    delay = (datetime.fromisoformat(row['next_attempt_at']) - before).total_seconds()
+    assert 20 <= delay <= 41
+
+@pytest.mark.asyncio
+async def test_send_fails_permanently_at_max_attempts(client):
+    client.rows.append(outbox_row(1, attempts=2))
+
+    await dispatcher(RecordingHandler(ConnectionError('edge function down')), max_attempts=3).drain_once()
+
+    row = row_by_id(client, 1)
+    assert row['status'] == 'failed'
+    assert row['attempts'] == 3
+
+@pytest.mark.asyncio
+async def test_row_without_handler_is_retried_as_a_failure(client):
+    client.rows.append(outbox_row(1, kind='unknown_kind'))
+
+    await dispatcher(RecordingHandler()).drain_once()
+
+    row = row_by_id(client, 1)
+    assert row['status'] == 'pending'
+    assert row['attempts'] == 1
+    assert row['last_error'].startswith('ValueError')
+
+@pytest.mark.asyncio
+async def test_stale_claims_are_released(client):
+    client.rows.extend([
+        outbox_row(1, status='processing', locked_at=iso(-600)),
+        outbox_row(2, status='processing', locked_at=iso(-10)),
+        outbox_row(3, status='sent', locked_at=iso(-600)),
+    ])
+
+    await dispatcher(RecordingHandler(), lease=300)._release_stale_claims()
+
+    assert row_by_id(client, 1)['status'] == 'pending'
+    assert row_by_id(client, 2)['status'] == 'processing'
+    assert row_by_id(client, 3)['status'] == 'sent'
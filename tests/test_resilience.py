@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from app.utils import resilience
+from app.utils.resilience import OutboundTimeout, call_outbound, latency_tracker
+
+@pytest.fixture(autouse=True)
+def fast_outbound(monkeypatch):
+    monkeypatch.setattr(resilience, '_latencies', {})
+    monkeypatch.setattr(resilience, 'OUTBOUND_RETRY_BASE_SECONDS', 0)
+    monkeypatch.setattr(resilience, 'OUTBOUND_MIN_TIMEOUT_SECONDS', 0.01)
+
+def prime(operation, seconds):
+    """Give an operation enough samples for adaptive deadlines and hedging"""
+    tracker = latency_tracker(operation)
+    for _ in range(resilience.MIN_SAMPLES):
+        tracker.record(seconds)
+
+class FlakyCall:
+    """Raises the given errors in order, then returns 'ok'"""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+@pytest.mark.asyncio
+async def test_idempotent_call_is_retried_on_transient_error():
+    fn = FlakyCall(httpx.ConnectError('reset'))
+    assert await call_outbound('test.read', fn, idempotent=True) == 'ok'
+    assert fn.calls == 2
+
+@pytest.mark.asyncio
+async def test_retries_stop_after_max_attempts():
+    fn = FlakyCall(*(httpx.ConnectError('reset') for _ in range(resilience.OUTBOUND_MAX_RETRIES + 1)))
+    with pytest.raises(httpx.ConnectError):
+        await call_outbound('test.read', fn, idempotent=True)
+    assert fn.calls == resilience.OUTBOUND_MAX_RETRIES + 1
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_is_not_retried():
+    fn = FlakyCall(httpx.ConnectError('reset'))
+    with pytest.raises(httpx.ConnectError):
+        await call_outbound('test.insert', fn)
+    assert fn.calls == 1
+
+@pytest.mark.asyncio
+async def test_permanent_error_is_not_retried():
+    fn = FlakyCall(ValueError('bad request'))
+    with pytest.raises(ValueError):
+        await call_outbound('test.read', fn, idempotent=True)
+    assert fn.calls == 1
+
+@pytest.mark.asyncio
+async def test_idempotent_call_times_out_at_adaptive_deadline():
+    prime('test.read', 0.01)
+
+    def slow():
+        time.sleep(0.3)
+
+    with pytest.raises(OutboundTimeout):
+        await call_outbound('test.read', slow, idempotent=True)
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_uses_fixed_deadline(monkeypatch):
+    # The adaptive deadline would be 30ms; the write must not be abandoned
+    prime('test.insert', 0.01)
+    monkeypatch.setattr(resilience, 'OUTBOUND_MAX_TIMEOUT_SECONDS', 1.0)
+
+    def slow():
+        time.sleep(0.1)
+        return 'ok'
+
+    assert await call_outbound('test.insert', slow) == 'ok'
+
+@pytest.mark.asyncio
+async def test_non_idempotent_call_times_out_at_fixed_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, 'OUTBOUND_MAX_TIMEOUT_SECONDS', 0.05)
+
+    def slow():
+        time.sleep(0.3)
+
+    with pytest.raises(OutboundTimeout):
+        await call_outbound('test.insert', slow)
+
+@pytest.mark.asyncio
+async def test_hedged_call_returns_second_request_when_first_is_slow():
+    prime('test.lookup', 0.01)
+    lock = threading.Lock()
+    calls = []
+
+    def lookup():
+        with lock:
+            calls.append(None)
+            first = len(calls) == 1
+        if first:
+            time.sleep(0.5)
+            return 'slow'
+        return 'fast'
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await call_outbound('test.lookup', lookup, idempotent=True, hedge=True) == 'fast'
+    assert loop.time() - start < 0.5
+    assert len(calls) == 2
+
+@pytest.mark.asyncio
+async def test_hedge_is_skipped_for_fast_calls():
+    prime('test.lookup', 0.2)
+    fn = FlakyCall()
+    assert await call_outbound('test.lookup', fn, idempotent=True, hedge=True) == 'ok'
+    assert fn.calls == 1
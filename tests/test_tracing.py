@@ -0,0 +1,91 @@
+import pytest
+from app.utils.tracing import (
+    OTLPExporter, SPAN_KIND_CLIENT, SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, Tracer, span
+)
+from app.utils.resilience import call_outbound
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+class RecordingExporter:
+    def __init__(self):
+        self.traces = []
+
+    def submit(self, trace):
+        self.traces.append(trace)
+
+@pytest.mark.parametrize('header, expected', [
+    (f'00-{TRACE_ID}-{PARENT_ID}-01', (TRACE_ID, PARENT_ID, True)),
+    (f'00-{TRACE_ID}-{PARENT_ID}-00', (TRACE_ID, PARENT_ID, False)),
+    (f' 00-{TRACE_ID.upper()}-{PARENT_ID}-03 ', (TRACE_ID, PARENT_ID, True)),
+    (None, (None, None, None)),
+    ('garbage', (None, None, None)),
+    (f'00-{TRACE_ID[:-1]}-{PARENT_ID}-01', (None, None, None)),
+    (f'ff-{TRACE_ID}-{PARENT_ID}-01', (None, None, None)),
+    (f'00-{"0" * 32}-{PARENT_ID}-01', (None, None, None)),
+    (f'00-{TRACE_ID}-{"0" * 16}-01', (None, None, None)),
+])
+def test_parse_traceparent(header, expected):
+    assert Tracer()._parse_traceparent(header) == expected
+
+@pytest.mark.parametrize('sample_rate, header, sampled', [
+    (0.0, f'00-{TRACE_ID}-{PARENT_ID}-01', True),
+    (1.0, f'00-{TRACE_ID}-{PARENT_ID}-00', False),
+    (1.0, None, True),
+    (0.0, None, False),
+    (1.0, 'garbage', True),
+])
+def test_sampling_decision(sample_rate, header, sampled):
+    with Tracer(sample_rate=sample_rate).trace('GET /', traceparent=header) as trace:
+        pass
+    assert trace.sampled is sampled
+
+def test_traceparent_continues_the_callers_trace():
+    with Tracer().trace('GET /', traceparent=f'00-{TRACE_ID}-{PARENT_ID}-01') as trace:
+        pass
+    assert trace.trace_id == TRACE_ID
+    assert trace.root.parent_id == PARENT_ID
+
+def test_unsampled_traces_record_spans_and_are_kept_when_slow():
+    exporter = RecordingExporter()
+    tracer = Tracer(sample_rate=0.0, slow_threshold_ms=0, exporter=exporter)
+
+    with tracer.trace('POST /api/auth/signup') as trace:
+        with span('supabase.auth.sign_up'):
+            pass
+
+    assert [s.name for s in trace.spans] == ['supabase.auth.sign_up']
+    assert [t['trace_id'] for t in tracer.slow_traces()] == [trace.trace_id]
+    assert exporter.traces == []
+
+def test_only_sampled_traces_are_exported():
+    exporter = RecordingExporter()
+    tracer = Tracer(sample_rate=1.0, slow_threshold_ms=float('inf'), exporter=exporter)
+
+    with tracer.trace('GET /') as trace:
+        pass
+
+    assert exporter.traces == [trace]
+    assert tracer.slow_traces() == []
+
+def test_kind_attribute_does_not_replace_span_kind():
+    with Tracer().trace('outbox.dispatch_batch', span_kind=SPAN_KIND_INTERNAL) as trace:
+        with span('supabase.functions.send-notification', kind='payment_receipt') as current:
+            pass
+
+    assert trace.root.kind == SPAN_KIND_INTERNAL
+    assert current.kind == SPAN_KIND_CLIENT
+    assert current.attributes == {'kind': 'payment_receipt'}
+
+@pytest.mark.asyncio
+async def test_outbound_span_encodes_integer_kind_for_otlp():
+    with Tracer().trace('POST /razorpay-webhook') as trace:
+        await call_outbound('supabase.functions.send-notification', lambda: None,
+                            notification_kind='payment_receipt')
+
+    encoded = OTLPExporter('http://collector:4318', 'yoga-backend')._encode(trace)
+    root, outbound = encoded['resourceSpans'][0]['scopeSpans'][0]['spans']
+    assert root['kind'] == SPAN_KIND_SERVER
+    assert outbound['kind'] == SPAN_KIND_CLIENT
+    assert outbound['parentSpanId'] == root['spanId']
+    assert {'key': 'notification_kind', 'value': {'stringValue': 'payment_receipt'}} in outbound['attributes']
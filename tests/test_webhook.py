@@ -0,0 +1,37 @@
+import hashlib
+import hmac
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.config import RAZORPAY_WEBHOOK_SECRET, WEBHOOK_MAX_BODY_BYTES
+from app.routers import webhook
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(webhook.router)
+    return TestClient(app)
+
+def sign(body: bytes) -> str:
+    return hmac.new(RAZORPAY_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+def test_missing_signature_is_rejected(client):
+    response = client.post('/razorpay-webhook', content=b'{}')
+    assert response.status_code == 400
+
+def test_invalid_signature_is_rejected(client):
+    body = b'{"event": "payment.captured"}'
+    response = client.post('/razorpay-webhook', content=body, headers={'x-razorpay-signature': sign(b'other')})
+    assert response.status_code == 400
+    assert response.json()['message'] == 'Invalid signature'
+
+def test_signed_body_that_is_not_json_is_rejected(client):
+    body = b'not json'
+    response = client.post('/razorpay-webhook', content=body, headers={'x-razorpay-signature': sign(body)})
+    assert response.status_code == 400
+    assert response.json()['message'] == 'Invalid JSON payload'
+
+def test_oversized_body_is_rejected(client):
+    body = b'x' * (WEBHOOK_MAX_BODY_BYTES + 1)
+    response = client.post('/razorpay-webhook', content=body, headers={'x-razorpay-signature': sign(body)})
+    assert response.status_code == 413